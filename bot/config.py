@@ -9,15 +9,16 @@ DB_PATH: str = os.getenv("DB_PATH", "bot.db")
 
 # Опциональный список разрешённых user_id (пусто = все)
 _raw_ids = os.getenv("ALLOWED_USER_IDS", "")
-ALLOWED_USER_IDS: list[int] = (
-    [int(x.strip()) for x in _raw_ids.split(",") if x.strip()]
-    if _raw_ids.strip()
-    else []
+# Кортеж хранит порядок из .env (нужен для PRIMARY_USER_ID),
+# frozenset — для проверки доступа за O(1) в каждом хендлере
+_ALLOWED_TUPLE: tuple[int, ...] = tuple(
+    int(x.strip()) for x in _raw_ids.split(",") if x.strip()
 )
+ALLOWED_USER_IDS: frozenset[int] = frozenset(_ALLOWED_TUPLE)
 
 # Первый пользователь из ALLOWED_USER_IDS — получает уведомления об алертах
 # добавленных через веб-интерфейс
-PRIMARY_USER_ID: int = ALLOWED_USER_IDS[0] if ALLOWED_USER_IDS else 0
+PRIMARY_USER_ID: int = _ALLOWED_TUPLE[0] if _ALLOWED_TUPLE else 0
 
 # URL веб-интерфейса (HTTPS, нужен для Telegram Mini App кнопки)
 WEB_URL: str = os.getenv("WEB_URL", "")
@@ -1,52 +1,287 @@
+import os
 import time
+import asyncio
 import logging
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Sequence
 
 import aiosqlite
 
 logger = logging.getLogger(__name__)
 
+_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-64000;
+    PRAGMA mmap_size=268435456;
+    PRAGMA foreign_keys=ON;
+"""
+
+# Читающим соединениям journal_mode/synchronous не нужны (они read-only)
+_READER_PRAGMAS = """
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-64000;
+    PRAGMA mmap_size=268435456;
+"""
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS alerts (
+        id            INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id       INTEGER NOT NULL,
+        ticker        TEXT    NOT NULL,
+        exchange      TEXT    NOT NULL,
+        company_name  TEXT    NOT NULL,
+        target_price  REAL    NOT NULL,
+        currency      TEXT    NOT NULL,
+        direction     TEXT    NOT NULL,
+        current_price REAL,
+        last_checked  REAL    DEFAULT 0,
+        is_active     INTEGER NOT NULL DEFAULT 1,
+        created_at    TEXT    NOT NULL DEFAULT (datetime('now'))
+    );
+
+    CREATE TABLE IF NOT EXISTS user_settings (
+        user_id          INTEGER PRIMARY KEY,
+        interval_ru      INTEGER NOT NULL DEFAULT 60,
+        interval_us      INTEGER NOT NULL DEFAULT 180,
+        display_currency TEXT    NOT NULL DEFAULT 'original'
+    );
+
+    -- Индексы под фильтры is_active / user_id (и ORDER BY exchange, ticker в вебе)
+    CREATE INDEX IF NOT EXISTS idx_alerts_user_active ON alerts(user_id, is_active);
+    CREATE INDEX IF NOT EXISTS idx_alerts_active ON alerts(is_active, exchange, ticker);
+"""
+
+_SQL_ADD_DISPLAY_CURRENCY = (
+    "ALTER TABLE user_settings ADD COLUMN display_currency TEXT NOT NULL DEFAULT 'original';"
+)
+
+# Биржа хранится в каноническом виде (верхний регистр, без пробелов) — горячие
+# проверки (market_hours, price_checker) сравнивают строки как есть.
+# Старые записи приводим при старте; без расхождений UPDATE ничего не пишет
+_SQL_NORMALIZE_EXCHANGE = (
+    "UPDATE alerts SET exchange = UPPER(TRIM(exchange)) "
+    "WHERE exchange <> UPPER(TRIM(exchange));"
+)
+
+# ─── SQL ─────────────────────────────────────────────────────────────────────
+# Статические запросы вынесены в константы: одна и та же строка попадает
+# в кеш подготовленных выражений соединения (cached_statements)
+
+_CACHED_STATEMENTS = 128
+
+# TTL кешей настроек и алертов пользователя. Свои записи сбрасывают кеш сразу;
+# изменения из другого процесса (бот ↔ веб) становятся видны не позже TTL.
+# Алерты живут короче: в них же лежат свежие цены от фонового чекера
+_SETTINGS_CACHE_TTL_SEC = 30.0
+_ALERTS_CACHE_TTL_SEC   = 5.0
+
+SQL_ADD_ALERT = """
+    INSERT INTO alerts
+        (user_id, ticker, exchange, company_name,
+         target_price, currency, direction, current_price)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+SQL_GET_USER_ALERTS = """
+    SELECT * FROM alerts
+    WHERE user_id = ? AND is_active = 1
+    ORDER BY created_at DESC
+"""
+
+# Один тикер — одна строка: цена из последней проверки, порядок — по самому
+# свежему алерту тикера (как в get_user_alerts)
+SQL_GET_USER_TICKERS = """
+    SELECT ticker, exchange, currency, current_price
+    FROM (
+        SELECT ticker, exchange, currency, current_price,
+               ROW_NUMBER()    OVER (PARTITION BY ticker, exchange
+                                     ORDER BY last_checked DESC) AS rn,
+               MAX(created_at) OVER (PARTITION BY ticker, exchange) AS newest
+        FROM alerts
+        WHERE user_id = ? AND is_active = 1
+    )
+    WHERE rn = 1
+    ORDER BY newest DESC
+"""
+
+# Только колонки, которые показывает веб (user_id, last_checked, is_active
+# списку не нужны): строки уже и дешевле копируются в карточки в _enrich
+SQL_GET_ALL_ACTIVE_ALERTS_WEB = """
+    SELECT id, ticker, exchange, company_name, target_price, currency,
+           direction, current_price, created_at
+    FROM alerts
+    WHERE is_active = 1
+    ORDER BY exchange, ticker
+"""
+
+SQL_GET_ALL_ACTIVE_ALERTS = """
+    SELECT a.*,
+           COALESCE(s.interval_ru, 60)  AS interval_ru,
+           COALESCE(s.interval_us, 180) AS interval_us
+    FROM alerts a
+    LEFT JOIN user_settings s ON a.user_id = s.user_id
+    WHERE a.is_active = 1
+"""
+
+# Только алерты, чей интервал проверки уже истёк (? — текущее время, unix)
+SQL_GET_DUE_ALERTS = """
+    SELECT a.*,
+           COALESCE(s.interval_ru, 60)  AS interval_ru,
+           COALESCE(s.interval_us, 180) AS interval_us
+    FROM alerts a
+    LEFT JOIN user_settings s ON a.user_id = s.user_id
+    WHERE a.is_active = 1
+      AND ? - COALESCE(a.last_checked, 0) >= CASE a.exchange
+              WHEN 'MOEX' THEN COALESCE(s.interval_ru, 60)
+              ELSE             COALESCE(s.interval_us, 180)
+          END
+"""
+
+# Покрывается индексом idx_alerts_active (is_active, exchange, ...)
+SQL_GET_ACTIVE_EXCHANGES = "SELECT DISTINCT exchange FROM alerts WHERE is_active = 1"
+
+SQL_GET_ALERT_BY_ID = "SELECT * FROM alerts WHERE id = ?"
+
+SQL_DELETE_ALERT = "DELETE FROM alerts WHERE id = ? AND user_id = ?"
+
+SQL_DEACTIVATE_ALERT = "UPDATE alerts SET is_active = 0 WHERE id = ?"
+
+SQL_UPDATE_ALERT_TARGET = """
+    UPDATE alerts
+    SET target_price  = ?,
+        direction     = ?,
+        current_price = ?,
+        is_active     = 1,
+        last_checked  = 0
+    WHERE id = ? AND user_id = ?
+    RETURNING *
+"""
+
+# Обе цели combined-карточки одним UPDATE (и одним commit)
+SQL_UPDATE_COMBINED_TARGETS = """
+    UPDATE alerts
+    SET target_price  = CASE id WHEN ?1 THEN ?3 ELSE ?4 END,
+        direction     = CASE id WHEN ?1 THEN 'above' ELSE 'below' END,
+        current_price = ?5,
+        is_active     = 1,
+        last_checked  = 0
+    WHERE id IN (?1, ?2)
+    RETURNING *
+"""
+
+SQL_UPDATE_ALERT_CHECK = "UPDATE alerts SET current_price = ?, last_checked = ? WHERE id = ?"
+
+SQL_GET_USER_SETTINGS = "SELECT * FROM user_settings WHERE user_id = ?"
+
+# None → NULL, и COALESCE оставляет старое значение колонки. В DO UPDATE
+# берём сами параметры (?2..?4), а не excluded.* — там уже подставлены
+# значения по умолчанию. WHERE пропускает UPDATE, если ничего не меняется
+# (повторный клик по тому же значению): страница не пачкается, commit не
+# пишет кадр в WAL, а RETURNING возвращает пустой результат
+SQL_UPSERT_USER_SETTINGS = """
+    INSERT INTO user_settings (user_id, interval_ru, interval_us, display_currency)
+    VALUES (?1, COALESCE(?2, 60), COALESCE(?3, 180), COALESCE(?4, 'original'))
+    ON CONFLICT(user_id) DO UPDATE SET
+        interval_ru      = COALESCE(?2, user_settings.interval_ru),
+        interval_us      = COALESCE(?3, user_settings.interval_us),
+        display_currency = COALESCE(?4, user_settings.display_currency)
+    WHERE ?2 IS NOT user_settings.interval_ru AND ?2 IS NOT NULL
+       OR ?3 IS NOT user_settings.interval_us AND ?3 IS NOT NULL
+       OR ?4 IS NOT user_settings.display_currency AND ?4 IS NOT NULL
+    RETURNING *
+"""
+
 
 class Database:
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, readers: Optional[int] = None):
         self.db_path = db_path
+        # Один писатель + пул читателей (WAL допускает параллельное чтение
+        # во время записи). Открываются в init(), закрываются в close()
+        self._writer: Optional[aiosqlite.Connection] = None
+        # Писатель один на все корутины: lock не даёт чужому commit/rollback
+        # попасть между execute и commit текущей операции
+        self._write_lock = asyncio.Lock()
+        self._readers: list[aiosqlite.Connection] = []
+        self._reader_queue: "asyncio.Queue[aiosqlite.Connection]" = asyncio.Queue()
+        self._n_readers = readers or os.cpu_count() or 1
+        # user_id → (monotonic-время записи, значение)
+        self._settings_cache: dict[int, tuple[float, dict]]      = {}
+        self._alerts_cache:   dict[int, tuple[float, list[aiosqlite.Row]]] = {}
 
     async def init(self) -> None:
-        """Создать таблицы при первом запуске."""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS alerts (
-                    id            INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id       INTEGER NOT NULL,
-                    ticker        TEXT    NOT NULL,
-                    exchange      TEXT    NOT NULL,
-                    company_name  TEXT    NOT NULL,
-                    target_price  REAL    NOT NULL,
-                    currency      TEXT    NOT NULL,
-                    direction     TEXT    NOT NULL,
-                    current_price REAL,
-                    last_checked  REAL    DEFAULT 0,
-                    is_active     INTEGER NOT NULL DEFAULT 1,
-                    created_at    TEXT    NOT NULL DEFAULT (datetime('now'))
-                )
-            """)
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS user_settings (
-                    user_id          INTEGER PRIMARY KEY,
-                    interval_ru      INTEGER NOT NULL DEFAULT 60,
-                    interval_us      INTEGER NOT NULL DEFAULT 180,
-                    display_currency TEXT    NOT NULL DEFAULT 'original'
-                )
-            """)
-            # Миграция: добавляем колонку если таблица уже существовала без неё
-            try:
-                await db.execute(
-                    "ALTER TABLE user_settings ADD COLUMN display_currency TEXT NOT NULL DEFAULT 'original'"
+        """Открыть соединения и создать таблицы при первом запуске."""
+        if self._writer is None:
+            self._writer = await aiosqlite.connect(
+                self.db_path, cached_statements=_CACHED_STATEMENTS
+            )
+            self._writer.row_factory = aiosqlite.Row
+            # WAL: чтение не блокируется записью (бот и веб делят один файл);
+            # synchronous=NORMAL в WAL безопасен и убирает лишний fsync на commit
+            await self._writer.executescript(_PRAGMAS)
+        db = self._writer
+
+        # Миграция: колонку добавляем, только если таблица уже существовала без неё
+        async with db.execute(
+            "SELECT name FROM pragma_table_info('user_settings')"
+        ) as cur:
+            columns = {row[0] for row in await cur.fetchall()}
+        migration = (
+            _SQL_ADD_DISPLAY_CURRENCY
+            if columns and "display_currency" not in columns
+            else ""
+        )
+        # Вся схема — одной транзакцией (один fsync вместо нескольких)
+        await db.executescript(
+            f"BEGIN;\n{_SCHEMA}\n{migration}\n{_SQL_NORMALIZE_EXCHANGE}\nCOMMIT;"
+        )
+
+        # Читатели открываются после создания схемы: mode=ro требует готовый файл
+        if not self._readers:
+            uri = f"file:{os.path.abspath(self.db_path)}?mode=ro"
+            for _ in range(self._n_readers):
+                conn = await aiosqlite.connect(
+                    uri, uri=True, cached_statements=_CACHED_STATEMENTS
                 )
-            except Exception:
-                pass  # колонка уже есть
-            await db.commit()
-        logger.info("База данных инициализирована: %s", self.db_path)
+                conn.row_factory = aiosqlite.Row
+                await conn.executescript(_READER_PRAGMAS)
+                self._readers.append(conn)
+                self._reader_queue.put_nowait(conn)
+        logger.info(
+            "База данных инициализирована: %s (читателей: %d)",
+            self.db_path, len(self._readers),
+        )
+
+    async def close(self) -> None:
+        """Закрыть все соединения при остановке процесса."""
+        for conn in self._readers:
+            await conn.close()
+        self._readers.clear()
+        self._reader_queue = asyncio.Queue()
+        if self._writer is not None:
+            await self._writer.close()
+            self._writer = None
+
+    @asynccontextmanager
+    async def _write(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Соединение-писатель под lock: все INSERT/UPDATE/DELETE — только так,
+        от execute до commit/rollback внутри одного блока."""
+        if self._writer is None:
+            raise RuntimeError("Database.init() не был вызван")
+        async with self._write_lock:
+            yield self._writer
+
+    @asynccontextmanager
+    async def _acquire_reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Взять свободное read-only соединение из пула и вернуть после запроса."""
+        if not self._readers:
+            raise RuntimeError("Database.init() не был вызван")
+        conn = await self._reader_queue.get()
+        try:
+            yield conn
+        finally:
+            self._reader_queue.put_nowait(conn)
 
     # ─── Алерты ────────────────────────────────────────────────────────────────
 
@@ -61,85 +296,132 @@ class Database:
         direction: str,
         current_price: float,
     ) -> int:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             cursor = await db.execute(
-                """
-                INSERT INTO alerts
-                    (user_id, ticker, exchange, company_name,
-                     target_price, currency, direction, current_price)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (user_id, ticker, exchange, company_name,
+                SQL_ADD_ALERT,
+                (user_id, ticker, exchange.strip().upper(), company_name,
                  target_price, currency, direction, current_price),
             )
             await db.commit()
-            return cursor.lastrowid  # type: ignore[return-value]
+        self._alerts_cache.pop(user_id, None)
+        return cursor.lastrowid  # type: ignore[return-value]
 
-    async def get_user_alerts(self, user_id: int) -> list[dict]:
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute(
-                """
-                SELECT * FROM alerts
-                WHERE user_id = ? AND is_active = 1
-                ORDER BY created_at DESC
-                """,
-                (user_id,),
-            ) as cur:
-                return [dict(row) for row in await cur.fetchall()]
+    async def add_alerts_many(self, rows: Sequence[tuple]) -> None:
+        """
+        Пакетная вставка одной транзакцией (импорт из Excel, пара above/below).
+        Кортежи — в порядке колонок SQL_ADD_ALERT. При ошибке откатывается вся пачка.
+        """
+        if not rows:
+            return
+        rows = [
+            (user_id, ticker, exchange.strip().upper(), *rest)
+            for user_id, ticker, exchange, *rest in rows
+        ]
+        async with self._write() as db:
+            try:
+                await db.executemany(SQL_ADD_ALERT, rows)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+        for user_id in {r[0] for r in rows}:
+            self._alerts_cache.pop(user_id, None)
+
+    async def get_user_alerts(self, user_id: int) -> list[aiosqlite.Row]:
+        """Активные алерты пользователя (кешируются на _ALERTS_CACHE_TTL_SEC).
+
+        Возвращается общий для всех вызовов список строк — не изменять на месте.
+        """
+        hit = self._alerts_cache.get(user_id)
+        if hit is not None and time.monotonic() - hit[0] < _ALERTS_CACHE_TTL_SEC:
+            return hit[1]
+        async with self._acquire_reader() as db:
+            async with db.execute(SQL_GET_USER_ALERTS, (user_id,)) as cur:
+                alerts = list(await cur.fetchall())
+        self._alerts_cache[user_id] = (time.monotonic(), alerts)
+        return alerts
 
-    async def get_all_active_alerts_web(self) -> list[dict]:
+    async def get_user_tickers(self, user_id: int) -> list[aiosqlite.Row]:
+        """Уникальные (ticker, exchange) пользователя с валютой и последней ценой."""
+        async with self._acquire_reader() as db:
+            async with db.execute(SQL_GET_USER_TICKERS, (user_id,)) as cur:
+                return list(await cur.fetchall())
+
+    async def get_all_active_alerts_web(self) -> list[aiosqlite.Row]:
         """Все активные алерты без фильтра по user_id (для веб-интерфейса)."""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute(
-                """
-                SELECT * FROM alerts
-                WHERE is_active = 1
-                ORDER BY exchange, ticker
-                """
-            ) as cur:
-                return [dict(row) for row in await cur.fetchall()]
+        async with self._acquire_reader() as db:
+            async with db.execute(SQL_GET_ALL_ACTIVE_ALERTS_WEB) as cur:
+                return list(await cur.fetchall())
 
-    async def get_all_active_alerts(self) -> list[dict]:
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute(
-                """
-                SELECT a.*,
-                       COALESCE(s.interval_ru, 60)  AS interval_ru,
-                       COALESCE(s.interval_us, 180) AS interval_us
-                FROM alerts a
-                LEFT JOIN user_settings s ON a.user_id = s.user_id
-                WHERE a.is_active = 1
-                """
-            ) as cur:
-                return [dict(row) for row in await cur.fetchall()]
+    async def iter_all_active_alerts_web(self) -> AsyncIterator[aiosqlite.Row]:
+        """То же, что get_all_active_alerts_web, но построчно, без общего списка.
+
+        Читатель занят, пока итерация не закончится — не держать генератор открытым.
+        """
+        async with self._acquire_reader() as db:
+            async with db.execute(SQL_GET_ALL_ACTIVE_ALERTS_WEB) as cur:
+                async for row in cur:
+                    yield row
 
-    async def get_alert_by_id(self, alert_id: int) -> Optional[dict]:
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+    async def get_all_active_alerts(self) -> list[aiosqlite.Row]:
+        async with self._acquire_reader() as db:
+            async with db.execute(SQL_GET_ALL_ACTIVE_ALERTS) as cur:
+                return list(await cur.fetchall())
+
+    async def get_due_alerts(self, now: float) -> list[aiosqlite.Row]:
+        """Активные алерты, которые пора проверить (фильтр по интервалу — в SQL)."""
+        async with self._acquire_reader() as db:
+            async with db.execute(SQL_GET_DUE_ALERTS, (now,)) as cur:
+                return list(await cur.fetchall())
+
+    async def get_active_exchanges(self) -> set[str]:
+        """Биржи, по которым есть хотя бы один активный алерт."""
+        async with self._acquire_reader() as db:
+            async with db.execute(SQL_GET_ACTIVE_EXCHANGES) as cur:
+                return {row[0] for row in await cur.fetchall()}
+
+    async def get_alert_by_id(self, alert_id: int) -> Optional[aiosqlite.Row]:
+        async with self._acquire_reader() as db:
+            async with db.execute(SQL_GET_ALERT_BY_ID, (alert_id,)) as cur:
+                return await cur.fetchone()
+
+    async def get_alerts_by_ids(self, alert_ids: Sequence[int]) -> dict[int, aiosqlite.Row]:
+        """Несколько алертов одним запросом: {id: строка}; ненайденных id в словаре нет."""
+        if not alert_ids:
+            return {}
+        placeholders = ",".join("?" * len(alert_ids))
+        async with self._acquire_reader() as db:
             async with db.execute(
-                "SELECT * FROM alerts WHERE id = ?", (alert_id,)
+                f"SELECT * FROM alerts WHERE id IN ({placeholders})", tuple(alert_ids)
             ) as cur:
-                row = await cur.fetchone()
-                return dict(row) if row else None
+                return {row["id"]: row for row in await cur.fetchall()}
 
     async def delete_alert(self, alert_id: int, user_id: int) -> bool:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
+            cur = await db.execute(SQL_DELETE_ALERT, (alert_id, user_id))
+            await db.commit()
+        self._alerts_cache.pop(user_id, None)
+        return cur.rowcount > 0
+
+    async def delete_alerts(self, alert_ids: Sequence[int]) -> int:
+        """Удаляет алерты по id без проверки владельца (веб видит все алерты)."""
+        if not alert_ids:
+            return 0
+        placeholders = ",".join("?" * len(alert_ids))
+        async with self._write() as db:
             cur = await db.execute(
-                "DELETE FROM alerts WHERE id = ? AND user_id = ?",
-                (alert_id, user_id),
+                f"DELETE FROM alerts WHERE id IN ({placeholders})", tuple(alert_ids)
             )
             await db.commit()
-            return cur.rowcount > 0
+        self._alerts_cache.clear()
+        return cur.rowcount
 
     async def deactivate_alert(self, alert_id: int) -> None:
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                "UPDATE alerts SET is_active = 0 WHERE id = ?", (alert_id,)
-            )
+        async with self._write() as db:
+            await db.execute(SQL_DEACTIVATE_ALERT, (alert_id,))
             await db.commit()
+        # Владелец по alert_id неизвестен без лишнего запроса — сбрасываем всё
+        self._alerts_cache.clear()
 
     async def update_alert_target(
         self,
@@ -148,43 +430,82 @@ class Database:
         new_target: float,
         direction: str,
         current_price: float,
-    ) -> bool:
-        async with aiosqlite.connect(self.db_path) as db:
-            cur = await db.execute(
-                """
-                UPDATE alerts
-                SET target_price  = ?,
-                    direction     = ?,
-                    current_price = ?,
-                    is_active     = 1,
-                    last_checked  = 0
-                WHERE id = ? AND user_id = ?
-                """,
+    ) -> Optional[aiosqlite.Row]:
+        """Обновлённая строка алерта (RETURNING) или None, если алерт не найден."""
+        async with self._write() as db:
+            async with db.execute(
+                SQL_UPDATE_ALERT_TARGET,
                 (new_target, direction, current_price, alert_id, user_id),
-            )
+            ) as cur:
+                # RETURNING-строки читаем до commit — иначе запрос не завершён
+                row = await cur.fetchone()
             await db.commit()
-            return cur.rowcount > 0
+        self._alerts_cache.pop(user_id, None)
+        return row
+
+    async def update_combined_targets(
+        self,
+        id_above: int,
+        id_below: int,
+        target_above: float,
+        target_below: float,
+        current_price: float,
+    ) -> tuple[Optional[aiosqlite.Row], Optional[aiosqlite.Row]]:
+        """Обновлённые строки (above, below); None — алерт с таким id не найден."""
+        async with self._write() as db:
+            async with db.execute(
+                SQL_UPDATE_COMBINED_TARGETS,
+                (id_above, id_below, target_above, target_below, current_price),
+            ) as cur:
+                rows = {row["id"]: row for row in await cur.fetchall()}
+            await db.commit()
+        for row in rows.values():
+            self._alerts_cache.pop(row["user_id"], None)
+        return rows.get(id_above), rows.get(id_below)
 
     async def update_alert_check(self, alert_id: int, current_price: float) -> None:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             await db.execute(
-                "UPDATE alerts SET current_price = ?, last_checked = ? WHERE id = ?",
-                (current_price, time.time(), alert_id),
+                SQL_UPDATE_ALERT_CHECK, (current_price, time.time(), alert_id)
+            )
+            await db.commit()
+
+    async def update_alert_checks_batch(
+        self,
+        rows: list[tuple[float, int]],
+        checked_at: Optional[float] = None,
+    ) -> None:
+        """Записать цены за весь цикл проверки одной транзакцией.
+
+        rows       — список (current_price, alert_id).
+        checked_at — время тика (time.time()), если вызывающий уже его знает;
+                     одно значение на всю пачку.
+        """
+        if not rows:
+            return
+        now = checked_at if checked_at is not None else time.time()
+        async with self._write() as db:
+            await db.executemany(
+                SQL_UPDATE_ALERT_CHECK,
+                [(price, now, alert_id) for price, alert_id in rows],
             )
             await db.commit()
 
     # ─── Настройки пользователя ─────────────────────────────────────────────
 
     async def get_user_settings(self, user_id: int) -> dict:
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute(
-                "SELECT * FROM user_settings WHERE user_id = ?", (user_id,)
-            ) as cur:
+        hit = self._settings_cache.get(user_id)
+        if hit is not None and time.monotonic() - hit[0] < _SETTINGS_CACHE_TTL_SEC:
+            return hit[1]
+        async with self._acquire_reader() as db:
+            async with db.execute(SQL_GET_USER_SETTINGS, (user_id,)) as cur:
                 row = await cur.fetchone()
-                if row:
-                    return dict(row)
-                return {"user_id": user_id, "interval_ru": 60, "interval_us": 180, "display_currency": "original"}
+        if row:
+            settings = dict(row)
+        else:
+            settings = {"user_id": user_id, "interval_ru": 60, "interval_us": 180, "display_currency": "original"}
+        self._settings_cache[user_id] = (time.monotonic(), settings)
+        return settings
 
     async def upsert_user_settings(
         self,
@@ -192,22 +513,21 @@ class Database:
         interval_ru: Optional[int] = None,
         interval_us: Optional[int] = None,
         display_currency: Optional[str] = None,
-    ) -> None:
-        current = await self.get_user_settings(user_id)
-        new_ru  = interval_ru       if interval_ru       is not None else current["interval_ru"]
-        new_us  = interval_us       if interval_us       is not None else current["interval_us"]
-        new_cur = display_currency  if display_currency  is not None else current["display_currency"]
-
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                """
-                INSERT INTO user_settings (user_id, interval_ru, interval_us, display_currency)
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(user_id) DO UPDATE SET
-                    interval_ru      = excluded.interval_ru,
-                    interval_us      = excluded.interval_us,
-                    display_currency = excluded.display_currency
-                """,
-                (user_id, new_ru, new_us, new_cur),
-            )
+    ) -> dict:
+        """Сохраняет переданные поля и возвращает настройки целиком (RETURNING)."""
+        async with self._write() as db:
+            async with db.execute(
+                SQL_UPSERT_USER_SETTINGS,
+                (user_id, interval_ru, interval_us, display_currency),
+            ) as cur:
+                row = await cur.fetchone()
             await db.commit()
+            if row is None:
+                # Значения совпали с сохранёнными — строку читаем писателем
+                # (видит последнюю запись, в отличие от кеша)
+                async with db.execute(SQL_GET_USER_SETTINGS, (user_id,)) as cur:
+                    row = await cur.fetchone()
+        settings = dict(row)
+        # Новая строка сразу идёт в кеш — повторный get_user_settings не нужен
+        self._settings_cache[user_id] = (time.monotonic(), settings)
+        return settings
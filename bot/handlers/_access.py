@@ -0,0 +1,28 @@
+"""
+Проверка доступа для хендлеров главного меню.
+"""
+from functools import wraps
+from typing import Awaitable, Callable
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from bot.config import ALLOWED_USER_IDS
+
+Handler = Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[None]]
+
+NO_ACCESS_TEXT = "⛔ Нет доступа."
+
+
+def require_access(fn: Handler) -> Handler:
+    """Пропускает в хендлер только пользователей из ALLOWED_USER_IDS (пустой — всех)."""
+    allowed = ALLOWED_USER_IDS
+
+    @wraps(fn)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if allowed and update.effective_user.id not in allowed:
+            await update.message.reply_text(NO_ACCESS_TEXT)
+            return
+        await fn(update, context)
+
+    return wrapper
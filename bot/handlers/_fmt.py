@@ -0,0 +1,21 @@
+"""
+Общие таблицы форматирования для хендлеров.
+
+Отсутствующий ключ не требует дефолта в каждом вызове: валюта без символа
+отображается своим кодом, неизвестное направление — пустой строкой.
+"""
+
+
+class _Syms(dict):
+    def __missing__(self, key: str) -> str:
+        return key
+
+
+class _Labels(dict):
+    def __missing__(self, key: str) -> str:
+        return ""
+
+
+CURRENCY_SYM    = _Syms(RUB="₽", USD="$", HKD="HK$")
+DIRECTION_LABEL = _Labels(above="▲ выше", below="▼ ниже")
+DIRECTION_ARROW = _Labels(above="▲", below="▼")
@@ -7,13 +7,18 @@
     WAITING_TARGET        — ожидаем целевую цену (первую или единственную)
     WAITING_TARGET_SECOND — ожидаем вторую целевую цену (режим "оба направления")
 """
+import asyncio
 import logging
+import re
+import time
+from typing import Optional
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 
 from bot.config import ALLOWED_USER_IDS
 from bot.database import Database
+from bot.handlers._fmt import CURRENCY_SYM
 from bot.keyboards import cancel_keyboard, main_menu_keyboard
 from bot.services.moex import get_stock_price as moex_price
 from bot.services.twelvedata import get_stock_price as td_price
@@ -25,30 +30,63 @@ WAITING_DIRECTION     = 2
 WAITING_TARGET        = 3
 WAITING_TARGET_SECOND = 4
 
-CURRENCY_SYM: dict[str, str] = {
-    "RUB": "₽",
-    "USD": "$",
-    "HKD": "HK$",
-}
+# Латиница, цифры, точка и дефис; 1–20 символов
+_TICKER_RE = re.compile(r"\A[A-Z0-9.\-]{1,20}\Z")
+
+# Кеш поиска тикера: повторный ввод того же тикера в течение TTL не ходит в API,
+# а параллельные запросы одного тикера ждут один общий поиск
+_LOOKUP_TTL_SEC  = 10.0
+_LOOKUP_MAX_SIZE = 512
+_lookup_cache:    dict[str, tuple[float, Optional[dict]]] = {}
+_lookup_inflight: dict[str, "asyncio.Task[Optional[dict]]"] = {}
 
 
 def _check_access(user_id: int) -> bool:
     return not ALLOWED_USER_IDS or user_id in ALLOWED_USER_IDS
 
 
-def _direction_keyboard() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton("▲ Только рост",    callback_data="dir_above"),
-            InlineKeyboardButton("▼ Только падение", callback_data="dir_below"),
-        ],
-        [
-            InlineKeyboardButton("↕️ Оба направления", callback_data="dir_both"),
-        ],
-        [
-            InlineKeyboardButton("❌ Отмена", callback_data="cancel"),
-        ],
-    ])
+async def _fetch_stock(ticker: str) -> Optional[dict]:
+    stock = await moex_price(ticker)
+    if not stock:
+        stock = await td_price(ticker)
+    return stock
+
+
+async def _lookup_stock(ticker: str) -> Optional[dict]:
+    """MOEX → TwelveData с TTL-кешем и склейкой одновременных запросов."""
+    hit = _lookup_cache.get(ticker)
+    if hit is not None and time.monotonic() - hit[0] < _LOOKUP_TTL_SEC:
+        return hit[1]
+
+    task = _lookup_inflight.get(ticker)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_stock(ticker))
+        _lookup_inflight[ticker] = task
+        try:
+            stock = await asyncio.shield(task)
+        finally:
+            _lookup_inflight.pop(ticker, None)
+        if len(_lookup_cache) >= _LOOKUP_MAX_SIZE:
+            # Вытесняем самую старую запись (dict хранит порядок вставки)
+            _lookup_cache.pop(next(iter(_lookup_cache)))
+        _lookup_cache[ticker] = (time.monotonic(), stock)
+        return stock
+    return await asyncio.shield(task)
+
+
+# Клавиатура статична — собираем один раз при импорте
+_DIRECTION_KB = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("▲ Только рост",    callback_data="dir_above"),
+        InlineKeyboardButton("▼ Только падение", callback_data="dir_below"),
+    ],
+    [
+        InlineKeyboardButton("↕️ Оба направления", callback_data="dir_both"),
+    ],
+    [
+        InlineKeyboardButton("❌ Отмена", callback_data="cancel"),
+    ],
+])
 
 
 # ─── Точка входа ─────────────────────────────────────────────────────────────
@@ -73,8 +111,7 @@ async def ticker_received(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     raw    = update.message.text.strip()
     ticker = raw.upper()
 
-    allowed_chars = set("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.-")
-    if not ticker or len(ticker) > 20 or not set(ticker).issubset(allowed_chars):
+    if not _TICKER_RE.match(ticker):
         await update.message.reply_text(
             "❌ Неверный формат тикера. Попробуйте ещё раз:",
             reply_markup=cancel_keyboard(),
@@ -83,10 +120,7 @@ async def ticker_received(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     await update.message.reply_text(f"🔍 Ищу *{ticker}*...", parse_mode="Markdown")
 
-    stock = await moex_price(ticker)
-    if not stock:
-        stock = await td_price(ticker)
-
+    stock = await _lookup_stock(ticker)
     if not stock:
         await update.message.reply_text(
             f"❌ Акция *{ticker}* не найдена.\n"
@@ -98,14 +132,14 @@ async def ticker_received(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     context.user_data["pending_stock"] = stock
 
-    sym = CURRENCY_SYM.get(stock["currency"], stock["currency"])
+    sym = CURRENCY_SYM[stock["currency"]]
     text = (
         f"✅ *{stock['company_name']} ({stock['exchange']})*\n"
         f"Текущая цена: *{stock['price']:.2f} {sym}*\n\n"
         f"Выберите направление уведомления:"
     )
     await update.message.reply_text(
-        text, parse_mode="Markdown", reply_markup=_direction_keyboard()
+        text, parse_mode="Markdown", reply_markup=_DIRECTION_KB
     )
     return WAITING_DIRECTION
 
@@ -124,7 +158,7 @@ async def direction_received(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await query.edit_message_text("❌ Ошибка сессии. Начните заново.")
         return ConversationHandler.END
 
-    sym = CURRENCY_SYM.get(stock["currency"], stock["currency"])
+    sym = CURRENCY_SYM[stock["currency"]]
 
     if direction == "dir_above":
         prompt = (
@@ -177,7 +211,7 @@ async def target_received(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     db: Database = context.bot_data["db"]
     user_id      = update.effective_user.id
-    sym          = CURRENCY_SYM.get(stock["currency"], stock["currency"])
+    sym          = CURRENCY_SYM[stock["currency"]]
 
     if direction == "dir_both":
         # Запоминаем первый таргет, просим второй
@@ -244,7 +278,7 @@ async def target_second_received(
 
     db: Database = context.bot_data["db"]
     user_id      = update.effective_user.id
-    sym          = CURRENCY_SYM.get(stock["currency"], stock["currency"])
+    sym          = CURRENCY_SYM[stock["currency"]]
 
     await db.add_alert(
         user_id      = user_id,
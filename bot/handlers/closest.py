@@ -3,19 +3,23 @@
 """
 import logging
 
-from telegram import Update
+import numpy as np
+from telegram import InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
 
-from bot.config import ALLOWED_USER_IDS
 from bot.database import Database
+from bot.handlers._access import require_access
+from bot.handlers._fmt import CURRENCY_SYM, DIRECTION_ARROW
 from bot.keyboards import main_menu_keyboard, portfolio_item_keyboard
 
 logger = logging.getLogger(__name__)
 
-CURRENCY_SYM    = {"RUB": "₽", "USD": "$", "HKD": "HK$"}
-DIRECTION_LABEL = {"above": "▲", "below": "▼"}
 BAR_LEN = 12  # длина прогресс-бара
 
+# С какого размера портфеля считать pct/dist_pct векторно через NumPy —
+# на малых списках накладные расходы на массивы больше выигрыша
+NUMPY_MIN_ALERTS = 50
+
 
 def _progress_bar(pct: float) -> str:
     filled = round(BAR_LEN * pct / 100)
@@ -24,7 +28,7 @@ def _progress_bar(pct: float) -> str:
 
 def _calc(alert: dict) -> dict:
     """Добавляет pct и dist_pct к алерту."""
-    current = alert.get("current_price")
+    current = alert["current_price"]
     target  = alert["target_price"]
     direction = alert["direction"]
 
@@ -38,13 +42,32 @@ def _calc(alert: dict) -> dict:
     return {**alert, "pct": pct, "dist_pct": dist_pct}
 
 
+def _calc_batch(alerts: list) -> list[dict]:
+    """То же, что _calc для каждого алерта, но одним векторным проходом."""
+    if len(alerts) < NUMPY_MIN_ALERTS:
+        return [_calc(a) for a in alerts]
+
+    n       = len(alerts)
+    current = np.fromiter((a["current_price"] or np.nan for a in alerts), dtype=np.float64, count=n)
+    target  = np.fromiter((a["target_price"]  or np.nan for a in alerts), dtype=np.float64, count=n)
+    above   = np.fromiter((a["direction"] == "above" for a in alerts), dtype=bool, count=n)
+
+    # NaN в сравнениях даёт False — пустые цены отсекаются той же маской
+    valid = (current > 0) & (target > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct      = np.minimum(np.where(above, current / target, target / current) * 100, 100.0)
+        dist_pct = np.abs((target - current) / current) * 100
+
+    return [
+        {**a, "pct": p if ok else None, "dist_pct": d if ok else None}
+        for a, ok, p, d in zip(alerts, valid.tolist(), pct.tolist(), dist_pct.tolist())
+    ]
+
+
+@require_access
 async def closest_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
 
-    if ALLOWED_USER_IDS and user_id not in ALLOWED_USER_IDS:
-        await update.message.reply_text("⛔ Нет доступа.")
-        return
-
     db: Database = context.bot_data["db"]
     alerts = await db.get_user_alerts(user_id)
 
@@ -55,7 +78,7 @@ async def closest_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         )
         return
 
-    enriched = [_calc(a) for a in alerts]
+    enriched = _calc_batch(alerts)
     enriched.sort(key=lambda a: a["dist_pct"] if a["dist_pct"] is not None else 9999)
 
     await update.message.reply_text(
@@ -63,10 +86,12 @@ async def closest_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         parse_mode="Markdown",
     )
 
+    # Сначала собираем все тексты (CPU), затем отправляем по порядку (IO)
+    cards: list[tuple[str, InlineKeyboardMarkup]] = []
     for a in enriched:
-        sym       = CURRENCY_SYM.get(a["currency"], a["currency"])
-        dir_label = DIRECTION_LABEL.get(a["direction"], "")
-        current   = a.get("current_price")
+        sym       = CURRENCY_SYM[a["currency"]]
+        dir_label = DIRECTION_ARROW[a["direction"]]
+        current   = a["current_price"]
         pct       = a["pct"]
         dist_pct  = a["dist_pct"]
 
@@ -87,8 +112,13 @@ async def closest_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             f"{prog}{dist}"
         )
 
+        cards.append(
+            (text, portfolio_item_keyboard(a["id"], a["ticker"], a["exchange"]))
+        )
+
+    # Строго по одной: смысл экрана — порядок по близости к цели, а
+    # параллельные запросы Telegram может доставить вперемешку
+    for text, keyboard in cards:
         await update.message.reply_text(
-            text,
-            parse_mode="Markdown",
-            reply_markup=portfolio_item_keyboard(a["id"], a["ticker"], a["exchange"]),
+            text, parse_mode="Markdown", reply_markup=keyboard
         )
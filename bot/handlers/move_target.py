@@ -9,19 +9,16 @@ from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 
 from bot.database import Database
+from bot.handlers._fmt import CURRENCY_SYM
 from bot.keyboards import cancel_move_keyboard, main_menu_keyboard
 from bot.services.moex import get_stock_price as moex_price
-from bot.services.yahoo import get_stock_price as yahoo_price
+from bot.services.yahoo import get_price as yahoo_last_price
 
 logger = logging.getLogger(__name__)
 
 WAITING_NEW_TARGET = 1
 
-CURRENCY_SYM: dict[str, str] = {
-    "RUB": "₽",
-    "USD": "$",
-    "HKD": "HK$",
-}
+_MOVE_PREFIX_LEN = len("move_target_")
 
 
 # ─── Точка входа (callback_data = "move_target_{id}") ───────────────────────
@@ -30,7 +27,7 @@ async def move_target_entry(update: Update, context: ContextTypes.DEFAULT_TYPE)
     query = update.callback_query
     await query.answer()
 
-    alert_id = int(query.data.split("_")[-1])
+    alert_id = int(query.data[_MOVE_PREFIX_LEN:])  # "move_target_42" → 42
     db: Database = context.bot_data["db"]
     alert = await db.get_alert_by_id(alert_id)
 
@@ -41,7 +38,7 @@ async def move_target_entry(update: Update, context: ContextTypes.DEFAULT_TYPE)
     context.user_data["move_alert_id"] = alert_id
     context.user_data["move_alert"]    = alert
 
-    sym = CURRENCY_SYM.get(alert["currency"], alert["currency"])
+    sym = CURRENCY_SYM[alert["currency"]]
     await query.message.reply_text(
         f"📝 Введите новую целевую цену для *{alert['ticker']}*\n"
         f"_(текущий таргет: {alert['target_price']:.2f} {sym})_:",
@@ -56,13 +53,16 @@ async def move_target_entry(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def new_target_received(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> int:
-    raw = update.message.text.strip().replace(",", ".")
+    raw = update.message.text.strip()
+    if "," in raw:
+        raw = raw.replace(",", ".")
 
+    # Нечисловой ввод и неположительная цена — одна ветка ошибки без raise
     try:
         new_target = float(raw)
-        if new_target <= 0:
-            raise ValueError
     except ValueError:
+        new_target = 0.0
+    if new_target <= 0:
         await update.message.reply_text(
             "❌ Введите корректное число:", reply_markup=cancel_move_keyboard(
                 context.user_data.get("move_alert_id", 0)
@@ -79,25 +79,28 @@ async def new_target_received(
     db      = context.bot_data["db"]
     user_id = alert["user_id"]
 
-    # Получаем свежую цену для определения направления
+    # Получаем свежую цену для определения направления (только цену, без метаданных)
     if alert["exchange"] == "MOEX":
-        fresh = await moex_price(alert["ticker"])
+        fresh       = await moex_price(alert["ticker"])
+        fresh_price = fresh["price"] if fresh else None
     else:
-        fresh = await yahoo_price(alert["ticker"])
+        fresh_price = await yahoo_last_price(alert["ticker"])
 
-    current_price = fresh["price"] if fresh else (alert.get("current_price") or 0.0)
+    current_price = fresh_price or (alert["current_price"] or 0.0)
     direction     = "above" if new_target >= current_price else "below"
 
-    success = await db.update_alert_target(
+    # Подтверждение строим по строке, которую вернул сам UPDATE
+    updated = await db.update_alert_target(
         alert_id, user_id, new_target, direction, current_price
     )
 
-    sym = CURRENCY_SYM.get(alert["currency"], alert["currency"])
-    if success:
-        action = "вырастет до" if direction == "above" else "упадёт до"
+    if updated is not None:
+        sym    = CURRENCY_SYM[updated["currency"]]
+        action = "вырастет до" if updated["direction"] == "above" else "упадёт до"
         await update.message.reply_text(
             f"✅ Таргет обновлён!\n"
-            f"Уведомлю, когда *{alert['ticker']}* {action} *{new_target:.2f} {sym}*.",
+            f"Уведомлю, когда *{updated['ticker']}* {action} "
+            f"*{updated['target_price']:.2f} {sym}*.",
             parse_mode="Markdown",
             reply_markup=main_menu_keyboard(),
         )
@@ -2,27 +2,57 @@
 Отображение портфеля (активных алертов) и удаление позиций.
 """
 import logging
+from functools import lru_cache
+from typing import Optional
 
-from telegram import Update
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
 
-from bot.config import ALLOWED_USER_IDS
 from bot.database import Database
-from bot.keyboards import main_menu_keyboard, portfolio_item_keyboard
+from bot.handlers._access import require_access
+from bot.handlers._fmt import CURRENCY_SYM, DIRECTION_LABEL
+from bot.keyboards import main_menu_keyboard, portfolio_item_row
 
 logger = logging.getLogger(__name__)
 
-CURRENCY_SYM: dict[str, str] = {"RUB": "₽", "USD": "$", "HKD": "HK$"}
-DIRECTION_LABEL: dict[str, str] = {"above": "▲ выше", "below": "▼ ниже"}
+# Лимит Telegram — 4096 символов; оставляем запас под разметку.
+# Кнопок в одной клавиатуре не больше 100 → до 50 позиций (по 2 кнопки)
+MESSAGE_LIMIT = 4000
+MAX_ITEM_ROWS = 50
+
+_DELETE_PREFIX     = "delete_alert_"
+_DELETE_PREFIX_LEN = len(_DELETE_PREFIX)
+
+# Блок позиции зависит только от отображаемых полей — они и есть ключ кеша,
+# так что смена цены/таргета просто даёт промах без явной инвалидации
+_RENDER_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=_RENDER_CACHE_SIZE)
+def _render_block(
+    ticker: str,
+    company_name: str,
+    direction: str,
+    target_price: float,
+    currency: str,
+    current: Optional[float],
+    exchange: str,
+) -> str:
+    sym         = CURRENCY_SYM[currency]
+    current_str = f"{current:.2f} {sym}" if current else "—"
+    # Смежные f-строки склеиваются компилятором в одну сборку строки
+    return (
+        f"📌 *{ticker}* | {company_name}\n"
+        f"🎯 Цель: {DIRECTION_LABEL[direction]} *{target_price:.2f} {sym}*\n"
+        f"💰 Последняя цена: {current_str}\n"
+        f"🏦 Биржа: {exchange}"
+    )
 
 
+@require_access
 async def portfolio_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
 
-    if ALLOWED_USER_IDS and user_id not in ALLOWED_USER_IDS:
-        await update.message.reply_text("⛔ Нет доступа.")
-        return
-
     db: Database = context.bot_data["db"]
     alerts = await db.get_user_alerts(user_id)
 
@@ -35,44 +65,92 @@ async def portfolio_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
         return
 
+    blocks: list[str] = []
+    rows:   list[list[InlineKeyboardButton]] = []
+    for alert in alerts:
+        # Поля строки читаем один раз — каждое обращение к Row это поиск по имени
+        ticker   = alert["ticker"]
+        exchange = alert["exchange"]
+        blocks.append(_render_block(
+            ticker,
+            alert["company_name"],
+            alert["direction"],
+            alert["target_price"],
+            alert["currency"],
+            alert["current_price"],
+            exchange,
+        ))
+        rows.append(portfolio_item_row(alert["id"], ticker, exchange))
+
+    # Весь портфель — одним сообщением (или несколькими, если не влезает
+    # в лимит Telegram), кнопки позиций — строками общей клавиатуры
+    header = f"📊 *Мой портфель* — {len(alerts)} активн. алерт(ов):"
+    chunk_text: list[str] = [header]
+    chunk_rows: list[list[InlineKeyboardButton]] = []
+    chunk_len = len(header)
+    for block, row in zip(blocks, rows):
+        if chunk_rows and (
+            chunk_len + len(block) + 2 > MESSAGE_LIMIT
+            or len(chunk_rows) >= MAX_ITEM_ROWS
+        ):
+            await _send_chunk(update, chunk_text, chunk_rows)
+            chunk_text, chunk_rows, chunk_len = [], [], 0
+        chunk_text.append(block)
+        chunk_rows.append(row)
+        chunk_len += len(block) + 2
+    await _send_chunk(update, chunk_text, chunk_rows)
+
+
+async def _send_chunk(
+    update: Update, blocks: list[str], rows: list[list[InlineKeyboardButton]]
+) -> None:
     await update.message.reply_text(
-        f"📊 *Мой портфель* — {len(alerts)} активн. алерт(ов):",
+        "\n\n".join(blocks),
         parse_mode="Markdown",
+        reply_markup=InlineKeyboardMarkup(rows),
     )
 
-    for alert in alerts:
-        sym          = CURRENCY_SYM.get(alert["currency"], alert["currency"])
-        dir_label    = DIRECTION_LABEL.get(alert["direction"], "")
-        current      = alert.get("current_price")
-        current_str  = f"{current:.2f} {sym}" if current else "—"
-
-        text = (
-            f"📌 *{alert['ticker']}* | {alert['company_name']}\n"
-            f"🎯 Цель: {dir_label} *{alert['target_price']:.2f} {sym}*\n"
-            f"💰 Последняя цена: {current_str}\n"
-            f"🏦 Биржа: {alert['exchange']}"
-        )
-        await update.message.reply_text(
-            text,
-            parse_mode="Markdown",
-            reply_markup=portfolio_item_keyboard(
-                alert["id"], alert["ticker"], alert["exchange"]
-            ),
-        )
+
+def _without_alert(
+    markup: Optional[InlineKeyboardMarkup], alert_id: int
+) -> Optional[InlineKeyboardMarkup]:
+    """Клавиатура без строки удалённого алерта — если в сообщении есть другие позиции.
+
+    None — сообщение относится только к этому алерту (уведомление, карточка).
+    """
+    if markup is None:
+        return None
+    target = f"{_DELETE_PREFIX}{alert_id}"
+    rows   = [
+        row for row in markup.inline_keyboard
+        if all(btn.callback_data != target for btn in row)
+    ]
+    has_others = any(
+        btn.callback_data and btn.callback_data.startswith(_DELETE_PREFIX)
+        for row in rows for btn in row
+    )
+    return InlineKeyboardMarkup(rows) if has_others else None
 
 
 async def delete_alert_callback(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> None:
     query = update.callback_query
-    await query.answer()
 
-    alert_id = int(query.data.split("_")[-1])
+    alert_id = int(query.data[_DELETE_PREFIX_LEN:])  # "delete_alert_42" → 42
     user_id  = update.effective_user.id
     db: Database = context.bot_data["db"]
 
     success = await db.delete_alert(alert_id, user_id)
-    if success:
-        await query.edit_message_text("🗑 Алерт удалён.")
-    else:
+    if not success:
         await query.answer("❌ Не удалось удалить алерт.", show_alert=True)
+        return
+
+    remaining = _without_alert(query.message.reply_markup if query.message else None, alert_id)
+    if remaining is not None:
+        # Общее сообщение портфеля: убираем только кнопки этой позиции
+        await query.answer("🗑 Алерт удалён.")
+        await query.edit_message_reply_markup(reply_markup=remaining)
+    else:
+        await query.answer()
+        await query.edit_message_text("🗑 Алерт удалён.")
@@ -9,43 +9,32 @@ import logging
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from bot.config import ALLOWED_USER_IDS
 from bot.database import Database
+from bot.handlers._access import require_access
+from bot.handlers._fmt import CURRENCY_SYM
 from bot.keyboards import main_menu_keyboard
 
 logger = logging.getLogger(__name__)
 
-CURRENCY_SYM: dict[str, str] = {"RUB": "₽", "USD": "$", "HKD": "HK$"}
-
 
+@require_access
 async def prices_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
 
-    if ALLOWED_USER_IDS and user_id not in ALLOWED_USER_IDS:
-        await update.message.reply_text("⛔ Нет доступа.")
-        return
-
     db: Database = context.bot_data["db"]
-    alerts = await db.get_user_alerts(user_id)
+    tickers = await db.get_user_tickers(user_id)
 
-    if not alerts:
+    if not tickers:
         await update.message.reply_text(
             "📈 Портфель пуст. Сначала добавьте акции!",
             reply_markup=main_menu_keyboard(),
         )
         return
 
-    # Уникальные тикеры — берём первый алерт для каждого (там хранится последняя цена)
-    seen: dict[tuple, dict] = {}
-    for a in alerts:
-        key = (a["ticker"], a["exchange"])
-        if key not in seen:
-            seen[key] = a
-
+    # Дедупликация по (ticker, exchange) — уже в SQL
     lines = ["📈 *Текущие цены:*\n"]
-    for (ticker, exchange), alert in seen.items():
-        sym     = CURRENCY_SYM.get(alert["currency"], alert["currency"])
-        current = alert.get("current_price")
+    for ticker, exchange, currency, current in tickers:
+        sym = CURRENCY_SYM[currency]
         if current:
             lines.append(f"• *{ticker}* ({exchange}): `{current:.2f} {sym}`")
         else:
@@ -6,8 +6,8 @@ import logging
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from bot.config import ALLOWED_USER_IDS
 from bot.database import Database
+from bot.handlers._access import require_access
 from bot.keyboards import (
     settings_keyboard,
     settings_ru_keyboard,
@@ -17,23 +17,35 @@ from bot.keyboards import (
 logger = logging.getLogger(__name__)
 
 
+# Все интервалы, которые можно выбрать кнопками (см. settings_*_keyboard)
+SEC_TO_MIN_STR: dict[int, str] = {60: "1", 120: "2", 180: "3", 300: "5", 600: "10"}
+
+_SETTINGS_TEMPLATE = (
+    "⚙️ *Настройки*\n\n"
+    "🇷🇺 Проверка РФ (MOEX): каждые *{ru} мин.*\n"
+    "🇺🇸🇭🇰 Проверка США/Гонконг: каждые *{us} мин.*"
+)
+
+# "set_ru_60" / "set_us_180" — префикс фиксированной длины, число берём срезом
+_SET_PREFIX_LEN = len("set_ru_")
+
+
+def _minutes(seconds: int) -> str:
+    text = SEC_TO_MIN_STR.get(seconds)
+    return text if text is not None else str(seconds // 60)
+
+
 def _settings_text(settings: dict) -> str:
-    ru_min = settings["interval_ru"] // 60
-    us_min = settings["interval_us"] // 60
-    return (
-        f"⚙️ *Настройки*\n\n"
-        f"🇷🇺 Проверка РФ (MOEX): каждые *{ru_min} мин.*\n"
-        f"🇺🇸🇭🇰 Проверка США/Гонконг: каждые *{us_min} мин.*"
+    return _SETTINGS_TEMPLATE.format(
+        ru=_minutes(settings["interval_ru"]),
+        us=_minutes(settings["interval_us"]),
     )
 
 
+@require_access
 async def settings_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
 
-    if ALLOWED_USER_IDS and user_id not in ALLOWED_USER_IDS:
-        await update.message.reply_text("⛔ Нет доступа.")
-        return
-
     db: Database = context.bot_data["db"]
     s = await db.get_user_settings(user_id)
     await update.message.reply_text(
@@ -74,12 +86,11 @@ async def set_interval_ru_callback(
 ) -> None:
     query    = update.callback_query
     await query.answer()
-    interval = int(query.data.split("_")[-1])  # "set_ru_60" → 60
+    interval = int(query.data[_SET_PREFIX_LEN:])  # "set_ru_60" → 60
     user_id  = update.effective_user.id
     db: Database = context.bot_data["db"]
 
-    await db.upsert_user_settings(user_id, interval_ru=interval)
-    s = await db.get_user_settings(user_id)
+    s = await db.upsert_user_settings(user_id, interval_ru=interval)
     await query.edit_message_text(
         _settings_text(s), parse_mode="Markdown", reply_markup=settings_keyboard()
     )
@@ -90,12 +101,11 @@ async def set_interval_us_callback(
 ) -> None:
     query    = update.callback_query
     await query.answer()
-    interval = int(query.data.split("_")[-1])  # "set_us_180" → 180
+    interval = int(query.data[_SET_PREFIX_LEN:])  # "set_us_180" → 180
     user_id  = update.effective_user.id
     db: Database = context.bot_data["db"]
 
-    await db.upsert_user_settings(user_id, interval_us=interval)
-    s = await db.get_user_settings(user_id)
+    s = await db.upsert_user_settings(user_id, interval_us=interval)
     await query.edit_message_text(
         _settings_text(s), parse_mode="Markdown", reply_markup=settings_keyboard()
     )
@@ -1,4 +1,5 @@
 import logging
+from typing import Optional
 
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton, WebAppInfo
 from telegram.ext import ContextTypes
@@ -8,6 +9,19 @@ from bot.keyboards import main_menu_keyboard
 
 logger = logging.getLogger(__name__)
 
+# Кнопка веб-интерфейса зависит только от WEB_URL — решаем один раз при импорте.
+# https → Telegram Mini App, иначе обычная ссылка; без WEB_URL — reply keyboard
+WEBAPP_BTN_LABEL = "📊 Открыть Trade Alerts"
+
+if WEB_URL.startswith("https://"):
+    _WEB_KB: Optional[InlineKeyboardMarkup] = InlineKeyboardMarkup(
+        [[InlineKeyboardButton(WEBAPP_BTN_LABEL, web_app=WebAppInfo(url=WEB_URL))]]
+    )
+elif WEB_URL:
+    _WEB_KB = InlineKeyboardMarkup([[InlineKeyboardButton(WEBAPP_BTN_LABEL, url=WEB_URL)]])
+else:
+    _WEB_KB = None
+
 
 async def start_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.effective_user
@@ -27,17 +41,5 @@ async def start_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         "Чтобы открыть интерфейс, нажми на кнопку ниже 👇🏻"
     )
 
-    if WEB_URL:
-        if WEB_URL.startswith("https://"):
-            btn = InlineKeyboardButton("📊 Открыть Trade Alerts", web_app=WebAppInfo(url=WEB_URL))
-        else:
-            btn = InlineKeyboardButton("📊 Открыть Trade Alerts", url=WEB_URL)
-
-        # Одно сообщение: текст + inline кнопка (как на скриншоте)
-        await update.message.reply_text(
-            text,
-            reply_markup=InlineKeyboardMarkup([[btn]]),
-        )
-    else:
-        # Без web url — показываем reply keyboard
-        await update.message.reply_text(text, reply_markup=main_menu_keyboard())
+    # Одно сообщение: текст + inline кнопка; без web url — reply keyboard
+    await update.message.reply_text(text, reply_markup=_WEB_KB or main_menu_keyboard())
@@ -2,22 +2,31 @@ from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMa
 
 # ─── Главное меню ────────────────────────────────────────────────────────────
 
+# Статичные клавиатуры собираются один раз при импорте: объекты PTB
+# неизменяемы, поэтому один экземпляр безопасно отдавать во все сообщения
+
+_MAIN_MENU = ReplyKeyboardMarkup(
+    [
+        ["➕ Добавить уведомление"],
+        ["🎯 Близко к цели", "📈 Текущие цены"],
+    ],
+    resize_keyboard=True,
+)
+
+
 def main_menu_keyboard() -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        [
-            ["➕ Добавить уведомление"],
-            ["🎯 Близко к цели", "📈 Текущие цены"],
-        ],
-        resize_keyboard=True,
-    )
+    return _MAIN_MENU
 
 
 # ─── Кнопка отмены (inline) ──────────────────────────────────────────────────
 
+_CANCEL = InlineKeyboardMarkup(
+    [[InlineKeyboardButton("❌ Отмена", callback_data="cancel")]]
+)
+
+
 def cancel_keyboard() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
-        [[InlineKeyboardButton("❌ Отмена", callback_data="cancel")]]
-    )
+    return _CANCEL
 
 
 # ─── Кнопки алерта (после срабатывания) ──────────────────────────────────────
@@ -63,41 +72,62 @@ def portfolio_item_keyboard(
     )
 
 
+def portfolio_item_row(
+    alert_id: int, ticker: str, exchange: str
+) -> list[InlineKeyboardButton]:
+    """Строка кнопок позиции для общей клавиатуры портфеля (с тикером в подписи)."""
+    return [
+        InlineKeyboardButton(
+            f"🗑 {ticker}", callback_data=f"delete_alert_{alert_id}"
+        ),
+        InlineKeyboardButton(
+            f"📊 {ticker}", url=_tradingview_url(ticker, exchange)
+        ),
+    ]
+
+
 # ─── Настройки ───────────────────────────────────────────────────────────────
 
-def settings_keyboard() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
+_SETTINGS = InlineKeyboardMarkup(
+    [
+        [InlineKeyboardButton("🇷🇺 Частота МБ (Россия)", callback_data="settings_ru")],
+        [InlineKeyboardButton("🇺🇸🇭🇰 Частота (США / Гонконг)", callback_data="settings_us")],
+    ]
+)
+
+_SETTINGS_RU = InlineKeyboardMarkup(
+    [
         [
-            [InlineKeyboardButton("🇷🇺 Частота МБ (Россия)", callback_data="settings_ru")],
-            [InlineKeyboardButton("🇺🇸🇭🇰 Частота (США / Гонконг)", callback_data="settings_us")],
-        ]
-    )
+            InlineKeyboardButton("1 мин",  callback_data="set_ru_60"),
+            InlineKeyboardButton("2 мин",  callback_data="set_ru_120"),
+            InlineKeyboardButton("5 мин",  callback_data="set_ru_300"),
+        ],
+        [InlineKeyboardButton("↩️ Назад", callback_data="back_to_settings")],
+    ]
+)
+
+_SETTINGS_US = InlineKeyboardMarkup(
+    [
+        [
+            InlineKeyboardButton("3 мин",  callback_data="set_us_180"),
+            InlineKeyboardButton("5 мин",  callback_data="set_us_300"),
+            InlineKeyboardButton("10 мин", callback_data="set_us_600"),
+        ],
+        [InlineKeyboardButton("↩️ Назад", callback_data="back_to_settings")],
+    ]
+)
+
+
+def settings_keyboard() -> InlineKeyboardMarkup:
+    return _SETTINGS
 
 
 def settings_ru_keyboard() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
-        [
-            [
-                InlineKeyboardButton("1 мин",  callback_data="set_ru_60"),
-                InlineKeyboardButton("2 мин",  callback_data="set_ru_120"),
-                InlineKeyboardButton("5 мин",  callback_data="set_ru_300"),
-            ],
-            [InlineKeyboardButton("↩️ Назад", callback_data="back_to_settings")],
-        ]
-    )
+    return _SETTINGS_RU
 
 
 def settings_us_keyboard() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
-        [
-            [
-                InlineKeyboardButton("3 мин",  callback_data="set_us_180"),
-                InlineKeyboardButton("5 мин",  callback_data="set_us_300"),
-                InlineKeyboardButton("10 мин", callback_data="set_us_600"),
-            ],
-            [InlineKeyboardButton("↩️ Назад", callback_data="back_to_settings")],
-        ]
-    )
+    return _SETTINGS_US
 
 
 # ─── Кнопка отмены переноса таргета ─────────────────────────────────────────
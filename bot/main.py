@@ -3,6 +3,7 @@
 """
 import logging
 import os
+import re
 import sys
 import warnings
 from telegram.warnings import PTBUserWarning
@@ -10,6 +11,7 @@ from telegram.warnings import PTBUserWarning
 from telegram import Update
 from telegram.ext import (
     Application,
+    ContextTypes,
     CallbackQueryHandler,
     CommandHandler,
     ConversationHandler,
@@ -19,11 +21,8 @@ from telegram.ext import (
 
 from bot.config import TELEGRAM_BOT_TOKEN, DB_PATH
 from bot.database import Database
-from bot.services.price_checker import (
-    check_prices_job,
-    td_batch_job,
-    TD_BATCH_INTERVAL_SEC,
-)
+from bot.services.http import close_session
+from bot.services.price_checker import price_tick, TD_BATCH_INTERVAL_SEC
 
 from bot.handlers.start import start_handler
 from bot.handlers.add_alert import (
@@ -71,7 +70,24 @@ logging.getLogger("apscheduler").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
 
-# ─── post_init: инициализация БД ─────────────────────────────────────────────
+# ─── Главное меню: один хендлер на все кнопки-тексты ─────────────────────────
+# Вместо отдельного MessageHandler с Regex на каждую кнопку — одна
+# скомпилированная альтернатива и словарь «текст кнопки → хендлер»
+
+_MENU_ROUTES = {
+    "🎯 Близко к цели": closest_handler,
+    "📈 Текущие цены":  prices_handler,
+}
+MENU_RE        = re.compile("^(?:" + "|".join(map(re.escape, _MENU_ROUTES)) + ")$")
+ADD_ALERT_RE   = re.compile(r"^➕ Добавить уведомление$")
+PRICES_MENU_RE = re.compile(r"^📈 Текущие цены$")
+
+
+async def menu_router(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await _MENU_ROUTES[update.message.text](update, context)
+
+
+# ─── post_init / post_shutdown: жизненный цикл БД и HTTP ──────────────────────
 
 async def post_init(application: Application) -> None:
     db: Database = application.bot_data["db"]
@@ -79,6 +95,12 @@ async def post_init(application: Application) -> None:
     logger.info("БД инициализирована")
 
 
+async def post_shutdown(application: Application) -> None:
+    db: Database = application.bot_data["db"]
+    await db.close()
+    await close_session()
+
+
 # ─── Сборка приложения ────────────────────────────────────────────────────────
 
 def build_app() -> Application:
@@ -92,6 +114,7 @@ def build_app() -> Application:
         Application.builder()
         .token(TELEGRAM_BOT_TOKEN)
         .post_init(post_init)
+        .post_shutdown(post_shutdown)
         .build()
     )
     app.bot_data["db"] = db
@@ -102,9 +125,7 @@ def build_app() -> Application:
     # чтобы PTB не выдавал предупреждение.
     add_conv = ConversationHandler(
         entry_points=[
-            MessageHandler(
-                filters.Regex(r"^➕ Добавить уведомление$"), add_alert_entry
-            )
+            MessageHandler(filters.Regex(ADD_ALERT_RE), add_alert_entry)
         ],
         states={
             WAITING_TICKER: [
@@ -127,10 +148,7 @@ def build_app() -> Application:
         fallbacks=[
             CommandHandler("cancel", cancel_add),
             # Нажатие кнопки главного меню завершает диалог
-            MessageHandler(
-                filters.Regex(r"^📈 Текущие цены$"),
-                cancel_add,
-            ),
+            MessageHandler(filters.Regex(PRICES_MENU_RE), cancel_add),
         ],
     )
 
@@ -158,29 +176,18 @@ def build_app() -> Application:
     app.add_handler(move_conv)
 
     # Главное меню
-    app.add_handler(
-        MessageHandler(filters.Regex(r"^🎯 Близко к цели$"), closest_handler)
-    )
-    app.add_handler(
-        MessageHandler(filters.Regex(r"^📈 Текущие цены$"), prices_handler)
-    )
+    app.add_handler(MessageHandler(filters.Regex(MENU_RE), menu_router))
 
     # Callback-кнопки (удаление алерта из уведомлений / "Близко к цели")
     app.add_handler(
         CallbackQueryHandler(delete_alert_callback, pattern=r"^delete_alert_\d+$")
     )
 
-    # ── Yahoo/MOEX: непрерывный мониторинг каждые 30 сек ───────────────────
-    app.job_queue.run_repeating(check_prices_job, interval=30, first=15)
-
-    # ── TwelveData: батч-валидация раз в несколько часов ───────────────────
-    # TD_BATCH_INTERVAL_SEC по умолчанию 10800 (3 ч).
+    # ── Проверка цен: один тик каждые 30 сек ───────────────────────────────
+    # Yahoo/MOEX — на каждом тике; TwelveData — тот же тик запускает батч
+    # раз в TD_BATCH_INTERVAL_SEC (по умолчанию 10800 = 3 ч).
     # 100 тикеров × 8 батчей/день = 800 кредитов/день — точно в лимите.
-    app.job_queue.run_repeating(
-        td_batch_job,
-        interval=TD_BATCH_INTERVAL_SEC,
-        first=120,  # первый запуск через 2 мин после старта
-    )
+    app.job_queue.run_repeating(price_tick, interval=30, first=15)
     logger.info(
         "TwelveData батч-проверка: каждые %.1f ч",
         TD_BATCH_INTERVAL_SEC / 3600,
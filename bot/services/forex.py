@@ -5,50 +5,65 @@
   USDRUB=X  — сколько рублей за 1 доллар
   HKDUSD=X  — сколько долларов за 1 гонконгский доллар
 
-Кешируются на 1 час. При ошибке возвращается пустой dict — вся логика
-конвертации тогда молча пропускает её и показывает родную валюту.
+Курс берётся из chart API Yahoo (meta.regularMarketPrice) — обе пары
+параллельно через общую aiohttp-сессию, без yfinance и отдельных потоков.
+
+Кешируются на 1 час (веб обновляет их заранее фоновой задачей keep_fresh);
+при ошибке обновления остаются прежние курсы. Если курсов не было вовсе —
+возвращается пустой dict, и конвертация молча показывает родную валюту.
 """
 import asyncio
-import concurrent.futures
 import logging
 import time
+from typing import Optional
 
-logger = logging.getLogger(__name__)
+from bot.services.yahoo import fetch_chart_meta
 
-_executor = concurrent.futures.ThreadPoolExecutor(
-    max_workers=1, thread_name_prefix="forex"
-)
+logger = logging.getLogger(__name__)
 
 _cache: dict[str, float] = {}
 _cache_ts: float = 0.0
 _CACHE_TTL = 3600  # обновляем курсы раз в час
+_RETRY_SEC = 60    # пауза перед повтором, если обновление не удалось
+_AHEAD_SEC = 60    # keep_fresh обновляет курсы за минуту до истечения TTL
 
 _PAIRS = ["USDRUB=X", "HKDUSD=X"]
 
 
-def _sync_fetch_rates() -> dict[str, float]:
-    import yfinance as yf
+async def _fetch_chart_rate(pair: str) -> Optional[float]:
+    """Последняя цена пары из chart API (маленький JSON, без cookie/crumb)."""
+    meta = await fetch_chart_meta(pair)
+    p    = meta.get("regularMarketPrice") if meta else None
+    return float(p) if p and float(p) > 0 else None
 
-    rates: dict[str, float] = {}
-    for pair in _PAIRS:
-        try:
-            t = yf.Ticker(pair)
-            p = t.fast_info.last_price
-            if p and float(p) > 0:
-                rates[pair] = float(p)
-                logger.debug("forex %s = %.4f", pair, rates[pair])
-        except Exception as exc:
-            logger.debug("forex %s: %s", pair, exc)
-    return rates
+
+# Один запрос к Yahoo на истёкший кеш, сколько бы вызовов ни пришло разом
+_refresh_lock = asyncio.Lock()
+
+
+def _fresh() -> bool:
+    return bool(_cache) and time.time() - _cache_ts < _CACHE_TTL
 
 
 async def get_rates() -> dict[str, float]:
-    """Возвращает кешированные курсы. Обновляет раз в час."""
-    global _cache, _cache_ts
-    if time.time() - _cache_ts < _CACHE_TTL and _cache:
+    """
+    Возвращает кешированные курсы. Обновляет раз в час.
+    Если обновление не удалось — отдаёт прежние (устаревшие) курсы.
+    """
+    if _fresh():
         return _cache
-    loop = asyncio.get_event_loop()
-    rates = await loop.run_in_executor(_executor, _sync_fetch_rates)
+    if _cache and _refresh_lock.locked():
+        return _cache  # обновление уже идёт — не ждём его, отдаём прежние курсы
+    async with _refresh_lock:
+        if _fresh():  # пока ждали lock, курсы обновил другой вызов
+            return _cache
+        return await _refresh()
+
+
+async def _refresh() -> dict[str, float]:
+    global _cache, _cache_ts
+    fetched = await asyncio.gather(*(_fetch_chart_rate(p) for p in _PAIRS))
+    rates   = {pair: p for pair, p in zip(_PAIRS, fetched) if p is not None}
     if rates:
         _cache = rates
         _cache_ts = time.time()
@@ -57,9 +72,63 @@ async def get_rates() -> dict[str, float]:
             rates.get("USDRUB=X", 0),
             rates.get("HKDUSD=X", 0),
         )
+    elif _cache:
+        # Yahoo не ответил — старые курсы живут ещё _RETRY_SEC, потом новая попытка
+        _cache_ts = time.time() - _CACHE_TTL + _RETRY_SEC
+        logger.warning("forex: обновить курсы не удалось, используем прежние")
     return _cache
 
 
+async def keep_fresh() -> None:
+    """
+    Фоновое обновление курсов до истечения TTL — get_rates в запросах всегда
+    попадает в свежий кеш и не ждёт Yahoo. Запускается задачей на время
+    жизни процесса и работает до отмены.
+    """
+    while True:
+        try:
+            async with _refresh_lock:
+                await _refresh()
+        except Exception:
+            logger.exception("forex: ошибка фонового обновления курсов")
+        # После неудачи _cache_ts сдвинут так, что пауза выходит ≈ _RETRY_SEC
+        delay = _cache_ts + _CACHE_TTL - _AHEAD_SEC - time.time()
+        await asyncio.sleep(max(delay, _RETRY_SEC))
+
+
+def refresh_matrix(rates: dict[str, float]) -> dict[tuple[str, str], float]:
+    """
+    Таблица множителей (from, to) → factor для всех пар RUB/USD/HKD.
+
+    Пустая, если курсов нет — тогда convert оставляет родную валюту.
+    """
+    usdrub = rates.get("USDRUB=X", 0.0)
+    hkdusd = rates.get("HKDUSD=X", 0.0)
+    if not usdrub or not hkdusd:
+        return {}
+
+    # Сколько USD стоит единица валюты
+    to_usd = {"USD": 1.0, "RUB": 1.0 / usdrub, "HKD": hkdusd}
+    return {
+        (src, dst): to_usd[src] / to_usd[dst]
+        for src in to_usd for dst in to_usd if src != dst
+    }
+
+
+# Таблица считается один раз на каждый новый dict курсов (get_rates отдаёт
+# один и тот же объект, пока кеш не обновится)
+_matrix_src: dict[str, float] = {}
+_matrix:     dict[tuple[str, str], float] = {}
+
+
+def _matrix_for(rates: dict[str, float]) -> dict[tuple[str, str], float]:
+    global _matrix_src, _matrix
+    if rates is not _matrix_src:
+        _matrix     = refresh_matrix(rates)
+        _matrix_src = rates
+    return _matrix
+
+
 def convert(
     price: float,
     from_currency: str,
@@ -74,28 +143,7 @@ def convert(
     if to_currency == "original" or from_currency == to_currency:
         return price, from_currency
 
-    usdrub = rates.get("USDRUB=X", 0.0)
-    hkdusd = rates.get("HKDUSD=X", 0.0)
-
-    if not usdrub or not hkdusd:
-        return price, from_currency  # курсы недоступны — без конвертации
-
-    # Сначала переводим в USD
-    if from_currency == "USD":
-        usd = price
-    elif from_currency == "RUB":
-        usd = price / usdrub
-    elif from_currency == "HKD":
-        usd = price * hkdusd
-    else:
-        return price, from_currency
-
-    # Из USD в нужную валюту
-    if to_currency == "USD":
-        return usd, "USD"
-    elif to_currency == "RUB":
-        return usd * usdrub, "RUB"
-    elif to_currency == "HKD":
-        return usd / hkdusd if hkdusd else price, "HKD"
-
-    return price, from_currency
+    factor = _matrix_for(rates).get((from_currency, to_currency))
+    if factor is None:
+        return price, from_currency  # курсы недоступны или валюта неизвестна
+    return price * factor, to_currency
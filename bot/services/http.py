@@ -0,0 +1,44 @@
+"""
+Общая aiohttp-сессия для HTTP-источников (MOEX ISS, TwelveData).
+
+Одна сессия на процесс — соединения переиспользуются (keep-alive), и каждый
+запрос не платит за TCP + TLS handshake. Таймауты задаются на уровне запроса:
+у каждого источника свой.
+"""
+import asyncio
+from typing import Optional
+
+import aiohttp
+
+_CONNECTOR_LIMIT          = 20
+_CONNECTOR_LIMIT_PER_HOST = 8
+_KEEPALIVE_TIMEOUT_SEC    = 75
+_DNS_CACHE_TTL_SEC        = 300
+
+_session: Optional[aiohttp.ClientSession] = None
+_session_lock = asyncio.Lock()
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """Ленивая инициализация: сессия создаётся внутри работающего event loop."""
+    global _session
+    if _session is not None and not _session.closed:
+        return _session
+    async with _session_lock:
+        if _session is None or _session.closed:
+            _session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=_CONNECTOR_LIMIT,
+                    limit_per_host=_CONNECTOR_LIMIT_PER_HOST,
+                    keepalive_timeout=_KEEPALIVE_TIMEOUT_SEC,
+                    ttl_dns_cache=_DNS_CACHE_TTL_SEC,
+                ),
+            )
+    return _session
+
+
+async def close_session() -> None:
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
@@ -13,6 +13,8 @@
 Добавляем буфер ±10 мин для захвата открытия/закрытия.
 """
 import datetime
+import functools
+import time
 from zoneinfo import ZoneInfo
 
 TZ_MOSCOW = ZoneInfo("Europe/Moscow")
@@ -75,42 +77,55 @@ _EXCHANGE_GROUPS: dict[str, dict] = {
 _BUFFER_MINUTES = 10
 
 
+def _minutes(hm: tuple[int, int]) -> int:
+    return hm[0] * 60 + hm[1]
+
+
+# (tz, открытие − буфер, закрытие + буфер, начало обеда, конец обеда) в минутах
+# от полуночи по местному времени; без обеда — пустой интервал (0, 0)
+_EXCHANGE_MINS: dict[str, tuple[ZoneInfo, int, int, int, int]] = {
+    name: (
+        cfg["tz"],
+        _minutes(cfg["open"])  - _BUFFER_MINUTES,
+        _minutes(cfg["close"]) + _BUFFER_MINUTES,
+        *((_minutes(cfg["lunch"][0]), _minutes(cfg["lunch"][1])) if cfg["lunch"] else (0, 0)),
+    )
+    for name, cfg in _EXCHANGE_GROUPS.items()
+}
+
+# Расписание размечено по минутам — решение для (биржа, минута UTC) не меняется
+# в течение минуты. Ключ с минутой сам «протухает», инвалидация не нужна
+_OPEN_CACHE_SIZE = 4096
+
+
 def is_market_open(exchange: str) -> bool:
     """
-    Проверяет, открыта ли биржа прямо сейчас.
+    Проверяет, открыта ли биржа прямо сейчас (с точностью до минуты).
 
     Неизвестные биржи → True (чтобы не пропустить алерт).
     """
-    cfg = _EXCHANGE_GROUPS.get(exchange.upper().strip())
-    if cfg is None:
+    return _is_market_open_at(exchange, int(time.time() // 60))
+
+
+@functools.lru_cache(maxsize=_OPEN_CACHE_SIZE)
+def _is_market_open_at(exchange: str, utc_minute: int) -> bool:
+    # exchange уже канонический: Database.add_alert хранит его в верхнем регистре
+    bounds = _EXCHANGE_MINS.get(exchange)
+    if bounds is None:
         return True  # неизвестная биржа — предполагаем открыто
 
-    now_utc = datetime.datetime.now(datetime.timezone.utc)
+    now_utc = datetime.datetime.fromtimestamp(utc_minute * 60, datetime.timezone.utc)
 
     # Выходные (0=Пн, 5=Сб, 6=Вс)
     if now_utc.weekday() >= 5:
         return False
 
-    now = now_utc.astimezone(cfg["tz"])
-    buf = datetime.timedelta(minutes=_BUFFER_MINUTES)
-
-    open_t  = now.replace(hour=cfg["open"][0],  minute=cfg["open"][1],  second=0, microsecond=0)
-    close_t = now.replace(hour=cfg["close"][0], minute=cfg["close"][1], second=0, microsecond=0)
-
-    # Раньше открытия или позже закрытия (с буфером)
-    if now < open_t - buf or now > close_t + buf:
-        return False
-
-    # Обед (опционально)
-    if cfg["lunch"]:
-        lunch_start_h, lunch_start_m = cfg["lunch"][0]
-        lunch_end_h,   lunch_end_m   = cfg["lunch"][1]
-        lunch_start = now.replace(hour=lunch_start_h, minute=lunch_start_m, second=0, microsecond=0)
-        lunch_end   = now.replace(hour=lunch_end_h,   minute=lunch_end_m,   second=0, microsecond=0)
-        if lunch_start <= now < lunch_end:
-            return False
+    tz, open_m, close_m, lunch_start, lunch_end = bounds
+    now = now_utc.astimezone(tz)
+    m   = now.hour * 60 + now.minute
 
-    return True
+    # Раньше открытия или позже закрытия (с буфером); обед — без буфера
+    return open_m <= m <= close_m and not (lunch_start <= m < lunch_end)
 
 
 def any_foreign_market_open() -> bool:
@@ -3,15 +3,24 @@
 Документация: https://iss.moex.com/iss/reference/
 """
 import logging
+import os
 from typing import Optional
 
 import aiohttp
+import orjson
+
+from bot.services.http import get_session
+from bot.services.price_cache import PriceCache
 
 logger = logging.getLogger(__name__)
 
 MOEX_BASE = "https://iss.moex.com/iss"
 _TIMEOUT = aiohttp.ClientTimeout(total=10)
 
+# Цена моложе TTL повторно не запрашивается (тик мониторинга — 30 сек)
+MOEX_PRICE_TTL_SEC: float = float(os.getenv("MOEX_PRICE_TTL_SEC", "25"))
+_price_cache = PriceCache(MOEX_PRICE_TTL_SEC)
+
 
 async def get_stock_price(ticker: str) -> Optional[dict]:
     """
@@ -35,29 +44,26 @@ async def get_stock_price(ticker: str) -> Optional[dict]:
     }
 
     try:
-        async with aiohttp.ClientSession(timeout=_TIMEOUT) as session:
-            async with session.get(url, params=params) as resp:
-                if resp.status != 200:
-                    logger.debug("MOEX вернул статус %s для %s", resp.status, ticker)
-                    return None
-                data = await resp.json(content_type=None)
+        session = await get_session()
+        async with session.get(url, params=params, timeout=_TIMEOUT) as resp:
+            if resp.status != 200:
+                logger.debug("MOEX вернул статус %s для %s", resp.status, ticker)
+                return None
+            data = orjson.loads(await resp.read())
     except Exception as exc:
         logger.warning("MOEX запрос для %s не выполнен: %s", ticker, exc)
         return None
 
-    sec_cols = data.get("securities", {}).get("columns", [])
-    sec_rows = data.get("securities", {}).get("data", [])
-    md_cols  = data.get("marketdata",  {}).get("columns", [])
-    md_rows  = data.get("marketdata",  {}).get("data",    [])
+    sec_rows = _rows(data, "securities")
+    md_rows  = _rows(data, "marketdata")
 
     if not sec_rows or not md_rows:
         return None
 
-    sec = dict(zip(sec_cols, sec_rows[0]))
-    md  = dict(zip(md_cols,  md_rows[0]))
+    sec = sec_rows[0]
+    md  = md_rows[0]
 
-    # Приоритет: последняя сделка → цена закрытия → цена предыдущего дня
-    price = md.get("LAST") or md.get("CLOSEPRICE") or md.get("MARKETPRICE2") or sec.get("PREVPRICE")
+    price = _pick_price(sec, md)
     if price is None:
         return None
 
@@ -66,7 +72,63 @@ async def get_stock_price(ticker: str) -> Optional[dict]:
     return {
         "ticker":       ticker,
         "company_name": company,
-        "price":        float(price),
+        "price":        price,
         "currency":     "RUB",
         "exchange":     "MOEX",
     }
+
+
+def _rows(data: dict, block: str) -> list[dict]:
+    """Блок ISS в колоночном формате {columns, data} → список словарей."""
+    b    = data.get(block) or {}
+    cols = b.get("columns", [])
+    return [dict(zip(cols, row)) for row in b.get("data", [])]
+
+
+def _pick_price(sec: dict, md: dict) -> Optional[float]:
+    # Приоритет: последняя сделка → цена закрытия → цена предыдущего дня
+    price = md.get("LAST") or md.get("CLOSEPRICE") or md.get("MARKETPRICE2") or sec.get("PREVPRICE")
+    return float(price) if price is not None else None
+
+
+async def get_batch_prices(tickers: list[str]) -> dict[str, float]:
+    """
+    Цены нескольких акций TQBR одним запросом ISS (параметр securities=).
+
+    Возвращает {ticker: price}; тикеры без цены в результат не попадают.
+    """
+    result, tickers = _price_cache.split(tickers)
+    if not tickers:
+        return result
+
+    url = f"{MOEX_BASE}/engines/stock/markets/shares/boards/TQBR/securities.json"
+    params = {
+        "iss.meta": "off",
+        "iss.only": "securities,marketdata",
+        "securities": ",".join(tickers),
+        "securities.columns": "SECID,PREVPRICE",
+        "marketdata.columns": "SECID,LAST,CLOSEPRICE,MARKETPRICE2",
+    }
+
+    try:
+        session = await get_session()
+        async with session.get(url, params=params, timeout=_TIMEOUT) as resp:
+            if resp.status != 200:
+                logger.debug("MOEX batch вернул статус %s", resp.status)
+                return result
+            data = orjson.loads(await resp.read())
+    except Exception as exc:
+        logger.warning("MOEX batch запрос (%d тикеров) не выполнен: %s", len(tickers), exc)
+        return result
+
+    secs = {sec["SECID"]: sec for sec in _rows(data, "securities")}
+
+    fetched: dict[str, float] = {}
+    for md in _rows(data, "marketdata"):
+        secid = md.get("SECID")
+        price = _pick_price(secs.get(secid, {}), md)
+        if secid and price is not None:
+            fetched[secid] = price
+    _price_cache.put(fetched)
+    result.update(fetched)
+    return result
@@ -0,0 +1,36 @@
+"""
+TTL-кеш цен для батч-источников (MOEX, Yahoo, TwelveData).
+
+Тикер, чья цена получена меньше TTL секунд назад, повторно не запрашивается —
+меньше HTTP-запросов и потраченных кредитов, когда проверки накладываются.
+"""
+import time
+
+
+class PriceCache:
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._entries: dict[str, tuple[float, float]] = {}  # ticker → (price, monotonic)
+
+    def split(self, tickers: list[str]) -> tuple[dict[str, float], list[str]]:
+        """Разделить тикеры на свежие цены из кеша и те, что нужно запросить."""
+        now    = time.monotonic()
+        hits:   dict[str, float] = {}
+        misses: list[str] = []
+        for t in tickers:
+            entry = self._entries.get(t)
+            if entry is not None and now - entry[1] < self.ttl:
+                hits[t] = entry[0]
+            else:
+                misses.append(t)
+        return hits, misses
+
+    def put(self, prices: dict[str, float]) -> None:
+        now = time.monotonic()
+        for t, p in prices.items():
+            self._entries[t] = (p, now)
+        # Вычищаем протухшее, чтобы словарь не рос за счёт удалённых тикеров
+        if len(self._entries) > 4 * max(len(prices), 64):
+            self._entries = {
+                t: e for t, e in self._entries.items() if now - e[1] < self.ttl
+            }
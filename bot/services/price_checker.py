@@ -1,15 +1,18 @@
 """
-Фоновые задачи проверки цен.
+Фоновая проверка цен.
 
-Два планировщика:
+Один планировщик — price_tick, каждые 30 сек:
 
-  check_prices_job  — каждые 30 сек (Yahoo + MOEX)
+  Yahoo + MOEX  — на каждом тике
     • Цены обновляются ВСЕГДА (даже когда биржа закрыта — Yahoo кеширует последнюю)
     • Telegram-уведомления только когда биржа открыта
-    • MOEX: поштучно через ISS (бесплатно)
+    • MOEX: батчами через ISS (securities=..., бесплатно)
     • US/HK: один батч через Yahoo Finance (бесплатно)
+    • Оба источника опрашиваются параллельно, цены пишутся одной транзакцией
+    • Когда все биржи из алертов закрыты — опрос раз в CLOSED_POLL_INTERVAL_SEC
 
-  td_batch_job  — каждые ~3 ч (TwelveData, только во время работы биржи)
+  TwelveData  — раз в ~3 ч (только во время работы биржи)
+    • Запускается тем же тиком фоновой задачей, когда подошёл срок
     • Пропускает если все иностранные биржи закрыты
     • Пропускает тикеры, чья биржа закрыта
     • Разбивает на группы по 8, rate limiter 8 req/мин
@@ -20,9 +23,12 @@
   - 100 тикеров × 3 цикла = 300 кредитов/день из 800
   - 500 кредитов остаётся в резерве
 """
+import asyncio
+import collections
 import logging
 import os
 import time
+from typing import Optional
 
 from telegram import Bot
 from telegram.ext import ContextTypes
@@ -30,7 +36,7 @@ from telegram.ext import ContextTypes
 from bot.config import ALLOWED_USER_IDS
 from bot.database import Database
 from bot.keyboards import alert_action_keyboard
-from bot.services.moex import get_stock_price as moex_price
+from bot.services.moex import get_batch_prices as moex_batch
 from bot.services.yahoo import get_batch_prices as yahoo_batch
 from bot.services.twelvedata import get_batch_prices as td_batch
 from bot.services.market_hours import is_market_open, any_foreign_market_open
@@ -38,79 +44,160 @@ from bot.services.market_hours import is_market_open, any_foreign_market_open
 logger = logging.getLogger(__name__)
 
 TD_BATCH_INTERVAL_SEC: int = int(os.getenv("TD_BATCH_INTERVAL_SEC", str(3 * 3600)))
+TD_FIRST_RUN_DELAY_SEC = 120  # первый TD-батч — через 2 мин после старта
+
+# Все биржи закрыты → цены не меняются: опрашиваем редко, а не каждые 30 сек.
+# Список бирж с активными алертами перечитываем не чаще раза в 5 мин
+CLOSED_POLL_INTERVAL_SEC = 300
+ACTIVE_EXCHANGES_TTL_SEC = 300
+
+# Тикеров в одном запросе ISS (securities=...) и одновременных запросов —
+# вежливость к бесплатному API
+MOEX_BATCH_SIZE  = 50
+MOEX_CONCURRENCY = 8
 
 CURRENCY_SYM: dict[str, str] = {"RUB": "₽", "USD": "$", "HKD": "HK$"}
 
+# TD-батч из-за rate limiter идёт минутами — держим его фоновой задачей,
+# чтобы не задерживать 30-секундные тики Yahoo/MOEX
+_td_next_run: Optional[float] = None
+_td_task:     Optional[asyncio.Task] = None
 
-# ─── Yahoo + MOEX: непрерывный мониторинг ────────────────────────────────────
+_active_exchanges:    set[str] = set()
+_active_exchanges_ts: float    = 0.0
+_last_closed_poll:    float    = 0.0
+
+
+# ─── Общий тик ───────────────────────────────────────────────────────────────
+
+async def price_tick(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Yahoo/MOEX — на каждом тике, TwelveData — когда пора."""
+    global _td_next_run, _td_task, _last_closed_poll
 
-async def check_prices_job(context: ContextTypes.DEFAULT_TYPE) -> None:
     db: Database = context.bot_data["db"]
-    await _run_yahoo_moex(context.bot, db)
+    now = time.time()
+
+    if _td_next_run is None:
+        _td_next_run = now + TD_FIRST_RUN_DELAY_SEC
+    if now >= _td_next_run and (_td_task is None or _td_task.done()):
+        _td_next_run = now + TD_BATCH_INTERVAL_SEC
+        _td_task     = context.application.create_task(_run_td_batch(context.bot, db))
 
+    if not await _any_market_open(db, now):
+        if now - _last_closed_poll < CLOSED_POLL_INTERVAL_SEC:
+            return
+        _last_closed_poll = now
+        logger.debug("Все биржи закрыты — редкий опрос цен")
 
-async def _run_yahoo_moex(bot: Bot, db: Database) -> None:
+    # Отбор «пора проверять» — в SQL: по сети не везём строки, которые отбросим
     try:
-        alerts = await db.get_all_active_alerts()
+        alerts = await db.get_due_alerts(now)
     except Exception as exc:
         logger.error("Не удалось получить алерты: %s", exc)
         return
 
-    now = time.time()
-    moex_due:    list[dict] = []
-    foreign_due: list[dict] = []
+    await _run_yahoo_moex(context.bot, db, alerts, now)
 
-    for alert in alerts:
-        exchange = alert["exchange"]
-
-        interval = (
-            alert.get("interval_ru", 60)
-            if exchange == "MOEX"
-            else alert.get("interval_us", 180)
-        )
-        last = alert.get("last_checked") or 0
-        if now - last >= interval:
-            if exchange == "MOEX":
-                moex_due.append(alert)
-            else:
-                foreign_due.append(alert)
 
-    # US/HK: один батч на все тикеры (Yahoo — бесплатно)
-    if foreign_due:
-        tickers = list({a["ticker"] for a in foreign_due})
-        prices  = await yahoo_batch(tickers)
-        logger.debug(
-            "Yahoo batch: %d тикеров, получено %d цен",
-            len(tickers), len(prices),
-        )
-        for alert in foreign_due:
-            price = prices.get(alert["ticker"])
-            if price is not None:
-                await _process_price(bot, db, alert, price)
-
-    # MOEX: поштучно
-    for alert in moex_due:
+async def _any_market_open(db: Database, now: float) -> bool:
+    """Открыта ли хоть одна биржа, по которой есть активные алерты."""
+    global _active_exchanges, _active_exchanges_ts
+    if now - _active_exchanges_ts >= ACTIVE_EXCHANGES_TTL_SEC:
         try:
-            data = await moex_price(alert["ticker"])
-            if data:
-                await _process_price(bot, db, alert, data["price"])
+            _active_exchanges = await db.get_active_exchanges()
         except Exception as exc:
-            logger.error("MOEX %s: %s", alert["ticker"], exc)
+            logger.error("Не удалось получить список бирж: %s", exc)
+            return True  # не знаем — не пропускаем
+        _active_exchanges_ts = now
+    return any(is_market_open(e) for e in _active_exchanges)
 
 
-# ─── TwelveData: батч-валидация раз в несколько часов ────────────────────────
+# ─── Yahoo + MOEX: непрерывный мониторинг ────────────────────────────────────
 
-async def td_batch_job(context: ContextTypes.DEFAULT_TYPE) -> None:
-    db: Database = context.bot_data["db"]
-    await _run_td_batch(context.bot, db)
+async def _run_yahoo_moex(
+    bot: Bot, db: Database, alerts: list, now: float
+) -> None:
+    # alerts — уже только «пора проверять» (get_due_alerts).
+    # ticker → алерты этого тикера; дедупликация тикеров — заодно с разбивкой
+    moex_due:    dict[str, list] = collections.defaultdict(list)
+    foreign_due: dict[str, list] = collections.defaultdict(list)
+    updates:     list[tuple[float, int]] = []
+    triggered:   list[tuple[dict, float]] = []
+
+    for alert in alerts:
+        if alert["exchange"] == "MOEX":
+            moex_due[alert["ticker"]].append(alert)
+        else:
+            foreign_due[alert["ticker"]].append(alert)
+
+    # Yahoo и MOEX — независимые источники, опрашиваем одновременно
+    await asyncio.gather(
+        _check_foreign(foreign_due, updates, triggered),
+        _check_moex(moex_due, updates, triggered),
+    )
+
+    # Сначала цены в БД, потом уведомления
+    await _flush_updates(db, updates, now)
+    await _notify(bot, db, triggered)
 
 
+async def _check_foreign(
+    by_ticker: dict[str, list],
+    updates: list[tuple[float, int]],
+    triggered: list[tuple[dict, float]],
+) -> None:
+    # US/HK: один батч на все тикеры (Yahoo — бесплатно)
+    if not by_ticker:
+        return
+    prices = await yahoo_batch(list(by_ticker))
+    logger.debug(
+        "Yahoo batch: %d тикеров, получено %d цен",
+        len(by_ticker), len(prices),
+    )
+    _apply_prices(by_ticker, prices, updates, triggered)
+
+
+async def _check_moex(
+    by_ticker: dict[str, list],
+    updates: list[tuple[float, int]],
+    triggered: list[tuple[dict, float]],
+) -> None:
+    # MOEX: батчами по MOEX_BATCH_SIZE тикеров, не больше MOEX_CONCURRENCY
+    # запросов одновременно
+    if not by_ticker:
+        return
+    tickers = list(by_ticker)
+    chunks  = [tickers[i:i + MOEX_BATCH_SIZE] for i in range(0, len(tickers), MOEX_BATCH_SIZE)]
+    sem     = asyncio.Semaphore(MOEX_CONCURRENCY)
+
+    async def _fetch(chunk: list[str]) -> dict[str, float]:
+        async with sem:
+            return await moex_batch(chunk)
+
+    prices: dict[str, float] = {}
+    for chunk, res in zip(chunks, await asyncio.gather(
+        *(_fetch(c) for c in chunks), return_exceptions=True
+    )):
+        if isinstance(res, Exception):
+            logger.error("MOEX batch %s: %s", chunk, res)
+        else:
+            prices.update(res)
+    logger.debug(
+        "MOEX batch: %d тикеров, получено %d цен",
+        len(tickers), len(prices),
+    )
+    _apply_prices(by_ticker, prices, updates, triggered)
+
+
+# ─── TwelveData: батч-валидация раз в несколько часов ────────────────────────
+
 async def _run_td_batch(bot: Bot, db: Database) -> None:
     # Пропускаем если все иностранные биржи закрыты — не тратим кредиты
     if not any_foreign_market_open():
         logger.info("TwelveData batch: все иностранные биржи закрыты, пропускаем")
         return
 
+    # TD валидирует все активные алерты, независимо от интервалов Yahoo/MOEX
     try:
         alerts = await db.get_all_active_alerts()
     except Exception as exc:
@@ -118,16 +205,16 @@ async def _run_td_batch(bot: Bot, db: Database) -> None:
         return
 
     # Берём только иностранные И чья биржа открыта сейчас
-    foreign_open = [
-        a for a in alerts
-        if a["exchange"] != "MOEX" and is_market_open(a["exchange"])
-    ]
+    by_ticker: dict[str, list] = collections.defaultdict(list)
+    for a in alerts:
+        if a["exchange"] != "MOEX" and is_market_open(a["exchange"]):
+            by_ticker[a["ticker"]].append(a)
 
-    if not foreign_open:
+    if not by_ticker:
         logger.info("TwelveData batch: нет открытых иностранных бирж")
         return
 
-    tickers = list({a["ticker"] for a in foreign_open})
+    tickers = list(by_ticker)
     logger.info(
         "TwelveData batch: запускаем валидацию %d тикеров "
         "(разбивка по %d в группе, rate limit 8 req/мин)",
@@ -140,38 +227,78 @@ async def _run_td_batch(bot: Bot, db: Database) -> None:
         logger.info("TwelveData batch: нет данных (бюджет или ошибка API)")
         return
 
-    for alert in foreign_open:
-        price = prices.get(alert["ticker"])
-        if price is not None:
-            await _process_price(bot, db, alert, price)
+    updates:   list[tuple[float, int]] = []
+    triggered: list[tuple[dict, float]] = []
+    _apply_prices(by_ticker, prices, updates, triggered)
+    await _flush_updates(db, updates)
+    await _notify(bot, db, triggered)
 
     logger.info(
         "TwelveData batch: обновлено %d/%d алертов",
-        sum(1 for a in foreign_open if a["ticker"] in prices),
-        len(foreign_open),
+        len(updates),
+        sum(len(group) for group in by_ticker.values()),
     )
 
 
-# ─── Обработка цены: обновление + проверка таргета ───────────────────────────
+# ─── Обработка цены: запись + проверка таргета + уведомления ────────────────
 
-async def _process_price(
-    bot: Bot, db: Database, alert: dict, current_price: float
+async def _flush_updates(
+    db: Database,
+    updates: list[tuple[float, int]],
+    checked_at: Optional[float] = None,
 ) -> None:
-    await db.update_alert_check(alert["id"], current_price)
+    """Одна транзакция на цикл вместо commit на каждый алерт."""
+    try:
+        await db.update_alert_checks_batch(updates, checked_at)
+    except Exception as exc:
+        logger.error("Не удалось записать цены (%d шт.): %s", len(updates), exc)
 
+
+def _apply_prices(
+    by_ticker: dict[str, list],
+    prices: dict[str, float],
+    updates: list[tuple[float, int]],
+    triggered: list[tuple[dict, float]],
+) -> None:
+    """Раздать цены алертам: запись в БД и уведомления — отдельно, после."""
+    for ticker, group in by_ticker.items():
+        price = prices.get(ticker)
+        if price is None:
+            continue
+        for alert in group:
+            # Запись в БД откладывается до конца цикла — см. _flush_updates
+            updates.append((price, alert["id"]))
+            if _process_price(alert, price):
+                triggered.append((alert, price))
+
+
+def _process_price(alert: dict, current_price: float) -> bool:
+    """Сработал ли алерт при этой цене (без побочных эффектов)."""
     # Telegram-уведомления только когда рынок открыт
     if not is_market_open(alert["exchange"]):
-        return
+        return False
 
     direction = alert["direction"]
-    triggered = (
+    return (
         direction == "above" and current_price >= alert["target_price"]
     ) or (
         direction == "below" and current_price <= alert["target_price"]
     )
 
-    if triggered:
-        await _send_notification(bot, db, alert, current_price)
+
+async def _notify(
+    bot: Bot, db: Database, triggered: list[tuple[dict, float]]
+) -> None:
+    """Уведомления по сработавшим алертам — параллельно, а не по очереди."""
+    if not triggered:
+        return
+    results = await asyncio.gather(
+        *(_send_notification(bot, db, alert, price) for alert, price in triggered),
+        return_exceptions=True,
+    )
+    for (alert, _), res in zip(triggered, results):
+        if isinstance(res, Exception):
+            logger.error("Уведомление %s: %s", alert["ticker"], res)
 
 
 async def _send_notification(
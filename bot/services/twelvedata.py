@@ -24,12 +24,15 @@ Twelve Data API — используется ТОЛЬКО для двух зад
 import asyncio
 import datetime
 import logging
-import time
+import os
 from typing import Optional
 
 import aiohttp
+import orjson
 
 from bot.config import TWELVEDATA_API_KEY
+from bot.services.http import get_session
+from bot.services.price_cache import PriceCache
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +49,10 @@ _MAX_REQUESTS_PER_MIN: int = 8
 TD_RESERVE_CREDITS: int = 100
 TD_DAILY_LIMIT:     int = 800
 
+# Цена моложе TTL не запрашивается повторно — не тратим кредиты впустую
+TD_PRICE_TTL_SEC: float = float(os.getenv("TD_PRICE_TTL_SEC", "60"))
+_price_cache = PriceCache(TD_PRICE_TTL_SEC)
+
 _EXCHANGE_CURRENCY: dict[str, str] = {
     "NASDAQ":    "USD",
     "NYSE":      "USD",
@@ -58,34 +65,22 @@ _EXCHANGE_CURRENCY: dict[str, str] = {
 
 # ─── Rate Limiter (скользящее окно 60 сек) ───────────────────────────────────
 
-_req_timestamps: list[float] = []
-_rate_lock = asyncio.Lock()
+_RATE_WINDOW_SEC = 60.0
+
+# Слот = право на один запрос; занятый слот возвращается через 60 сек после
+# запроса. Ожидающие не держат общий lock — свободные слоты разбираются сразу
+_rate_slots = asyncio.Semaphore(_MAX_REQUESTS_PER_MIN)
 
 
 async def _rate_limit() -> None:
     """
     Ждёт, если за последние 60 сек уже было ≥ _MAX_REQUESTS_PER_MIN запросов.
-    Добавляет текущий timestamp в очередь.
+    Слот освобождается таймером event loop через _RATE_WINDOW_SEC.
     """
-    async with _rate_lock:
-        now = time.monotonic()
-        window = 60.0
-
-        # Очищаем старые записи
-        while _req_timestamps and now - _req_timestamps[0] >= window:
-            _req_timestamps.pop(0)
-
-        if len(_req_timestamps) >= _MAX_REQUESTS_PER_MIN:
-            # Ждём до момента, когда самый старый запрос выйдет за окно
-            wait = window - (now - _req_timestamps[0]) + 0.05
-            logger.debug("TD rate limit: ждём %.1f сек", wait)
-            await asyncio.sleep(wait)
-            # Повторно очищаем
-            now = time.monotonic()
-            while _req_timestamps and now - _req_timestamps[0] >= window:
-                _req_timestamps.pop(0)
-
-        _req_timestamps.append(time.monotonic())
+    if _rate_slots.locked():
+        logger.debug("TD rate limit: все %d слотов заняты, ждём", _MAX_REQUESTS_PER_MIN)
+    await _rate_slots.acquire()
+    asyncio.get_running_loop().call_later(_RATE_WINDOW_SEC, _rate_slots.release)
 
 
 # ─── Дневной бюджет ──────────────────────────────────────────────────────────
@@ -146,9 +141,9 @@ async def get_stock_price(ticker: str) -> Optional[dict]:
     await _rate_limit()
 
     try:
-        async with aiohttp.ClientSession(timeout=_TIMEOUT) as session:
-            async with session.get(url, params=params) as resp:
-                data = await resp.json(content_type=None)
+        session = await get_session()
+        async with session.get(url, params=params, timeout=_TIMEOUT) as resp:
+            data = orjson.loads(await resp.read())
     except Exception as exc:
         logger.warning("TwelveData /quote %s: %s", ticker, exc)
         return None
@@ -177,10 +172,10 @@ async def get_stock_price(ticker: str) -> Optional[dict]:
 
 # ─── Батч-запрос /price (периодическая валидация) ───────────────────────────
 
-async def _fetch_chunk(tickers: list[str]) -> dict[str, float]:
+async def _fetch_chunk(tickers: list[str]) -> Optional[dict[str, float]]:
     """
     Один HTTP-запрос для группы тикеров через /price.
-    Возвращает {ticker: price}.
+    Возвращает {ticker: price}; None — запрос не удался (кредиты не списаны).
     """
     url    = f"{_BASE}/price"
     params = {
@@ -192,18 +187,18 @@ async def _fetch_chunk(tickers: list[str]) -> dict[str, float]:
     await _rate_limit()  # соблюдаем 8 запросов/мин
 
     try:
-        async with aiohttp.ClientSession(timeout=_TIMEOUT) as session:
-            async with session.get(url, params=params) as resp:
-                data = await resp.json(content_type=None)
+        session = await get_session()
+        async with session.get(url, params=params, timeout=_TIMEOUT) as resp:
+            data = orjson.loads(await resp.read())
     except Exception as exc:
         logger.warning("TwelveData /price chunk %s: %s", tickers, exc)
-        return {}
+        return None
 
     if not isinstance(data, dict):
-        return {}
+        return None
     if "code" in data or data.get("status") == "error":
         logger.warning("TwelveData /price ошибка: %s", data.get("message", data))
-        return {}
+        return None
 
     result: dict[str, float] = {}
 
@@ -241,19 +236,23 @@ async def get_batch_prices(tickers: list[str]) -> dict[str, float]:
     Алгоритм:
       1. Фильтруем тикеры которых хватает бюджета
       2. Разбиваем на группы по _CHUNK_SIZE (8)
-      3. Шлём по 1 запросу, соблюдая rate limiter (8 req/min)
-      4. Итого 100 тикеров → ~13 запросов → ~2 мин
+      3. Шлём группы параллельно; rate limiter пропускает 8 req/min
+      4. Итого 100 тикеров → ~13 запросов → ~1 мин (8 сразу, 5 — в следующем окне)
     """
     if not tickers or not TWELVEDATA_API_KEY:
         return {}
 
+    cached, tickers = _price_cache.split(tickers)
+    if not tickers:
+        return cached
+
     available = _budget_remaining() - TD_RESERVE_CREDITS
     if available <= 0:
         logger.warning(
             "TwelveData batch: бюджет исчерпан (доступно %d кред., резерв %d), пропускаем",
             _budget_remaining(), TD_RESERVE_CREDITS,
         )
-        return {}
+        return cached
 
     # Урезаем список если кредитов не хватит на всех
     if len(tickers) > available:
@@ -273,14 +272,21 @@ async def get_batch_prices(tickers: list[str]) -> dict[str, float]:
     result: dict[str, float] = {}
     credits_spent = 0
 
-    for chunk in chunks:
-        chunk_result = await _fetch_chunk(chunk)
-        result.update(chunk_result)
-        credits_spent += len(chunk)
+    chunk_results = await asyncio.gather(
+        *(_fetch_chunk(c) for c in chunks), return_exceptions=True
+    )
+    for chunk, chunk_result in zip(chunks, chunk_results):
+        if isinstance(chunk_result, dict):
+            result.update(chunk_result)
+            credits_spent += len(chunk)  # кредиты — только за успешные запросы
+        elif isinstance(chunk_result, Exception):
+            logger.warning("TwelveData /price chunk %s: %s", chunk, chunk_result)
 
     _budget_spend(credits_spent)
+    _price_cache.put(result)
     logger.info(
-        "TwelveData batch: получено %d/%d цен, потрачено %d кредитов",
-        len(result), len(tickers), credits_spent,
+        "TwelveData batch: получено %d/%d цен, потрачено %d кредитов (из кеша %d)",
+        len(result), len(tickers), credits_spent, len(cached),
     )
+    result.update(cached)
     return result
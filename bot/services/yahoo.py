@@ -4,26 +4,107 @@ Yahoo Finance (yfinance) — бесплатный источник цен без
 Поддерживает батч-запросы: 100+ тикеров за один вызов.
 
 Стратегия получения цены (single):
-  1. fast_info.last_price — мгновенно, работает и когда рынок закрыт
-  2. history(period="5d") — надёжный fallback, возвращает последние торги
-  3. download(period="1d", interval="5m") — только если рынок открыт
+  1. chart API (meta) — один маленький JSON: цена + название, валюта, биржа
+  2. fast_info.last_price — fallback через yfinance, работает и когда рынок закрыт
+  3. history(period="5d") — надёжный fallback, возвращает последние торги
+  Тяжёлый t.info (quoteSummary) — только если chart API недоступен.
 
 Стратегия batch:
-  1. download(period="1d", interval="5m") — быстро когда рынок открыт
-  2. download(period="5d", interval="1d") — fallback для закрытого рынка
+  1. spark API — один JSON на 20 тикеров, цена из meta.regularMarketPrice
+     (без pandas), пачки запрашиваются параллельно
+  2. download(period="1d", interval="5m") — fallback для тикеров без цены
+  3. download(period="5d", interval="1d") — fallback для закрытого рынка
 """
 import asyncio
 import concurrent.futures
 import logging
+import os
 from typing import Optional
 
+import aiohttp
+import orjson
+
+from bot.services.http import get_session
+from bot.services.price_cache import PriceCache
+
 logger = logging.getLogger(__name__)
 
+_CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{symbol}"
+_SPARK_URL = "https://query1.finance.yahoo.com/v7/finance/spark"
+_SPARK_BATCH_SIZE = 20  # больше spark API в одном запросе не принимает
+_TIMEOUT   = aiohttp.ClientTimeout(total=10)
+# Без браузерного User-Agent Yahoo отвечает 429
+_HEADERS   = {"User-Agent": "Mozilla/5.0"}
+
+# Цена моложе TTL повторно не запрашивается (тик мониторинга — 30 сек)
+YAHOO_PRICE_TTL_SEC: float = float(os.getenv("YAHOO_PRICE_TTL_SEC", "25"))
+_price_cache = PriceCache(YAHOO_PRICE_TTL_SEC)
+
+# HTTP-соединения yfinance и так переиспользует (общая curl_cffi-сессия внутри
+# библиотеки) — свою requests.Session не передаём: yfinance ≥0.2.54 её
+# отвергает. Параллелизм даём потоками: поиск тикера не ждёт батч мониторинга
 _executor = concurrent.futures.ThreadPoolExecutor(
-    max_workers=2, thread_name_prefix="yfinance"
+    max_workers=4, thread_name_prefix="yfinance"
 )
 
 
+async def fetch_chart_meta(symbol: str) -> Optional[dict]:
+    """
+    meta из chart API: regularMarketPrice, longName/shortName, currency,
+    exchangeName. Без cookie/crumb, через общую aiohttp-сессию.
+    """
+    try:
+        session = await get_session()
+        async with session.get(
+            _CHART_URL.format(symbol=symbol),
+            params={"range": "1d", "interval": "1d"},
+            headers=_HEADERS,
+            timeout=_TIMEOUT,
+        ) as resp:
+            if resp.status != 200:
+                logger.debug("Yahoo chart %s: статус %s", symbol, resp.status)
+                return None
+            data = orjson.loads(await resp.read())
+        return data["chart"]["result"][0]["meta"]
+    except Exception as exc:
+        logger.debug("Yahoo chart %s: %s", symbol, exc)
+        return None
+
+
+async def _fetch_spark(symbols: list[str]) -> dict[str, float]:
+    """Последние цены пачки тикеров одним запросом spark API."""
+    try:
+        session = await get_session()
+        async with session.get(
+            _SPARK_URL,
+            params={"symbols": ",".join(symbols), "range": "1d", "interval": "1d"},
+            headers=_HEADERS,
+            timeout=_TIMEOUT,
+        ) as resp:
+            if resp.status != 200:
+                logger.debug("Yahoo spark: статус %s", resp.status)
+                return {}
+            data = orjson.loads(await resp.read())
+    except Exception as exc:
+        logger.debug("Yahoo spark %s: %s", symbols, exc)
+        return {}
+
+    result: dict[str, float] = {}
+    for item in (data.get("spark") or {}).get("result") or []:
+        try:
+            price = _meta_price(item["response"][0]["meta"])
+        except (KeyError, IndexError, TypeError):
+            continue
+        if price is not None:
+            result[item["symbol"]] = price
+    return result
+
+
+def _meta_price(meta: Optional[dict]) -> Optional[float]:
+    p = meta.get("regularMarketPrice") if meta else None
+    return float(p) if p and float(p) > 0 else None
+
+
 def _get_price_from_ticker(t) -> Optional[float]:
     """Получить последнюю цену через fast_info или history."""
     # 1. fast_info.last_price — работает всегда (кеш Yahoo)
@@ -47,6 +128,17 @@ def _get_price_from_ticker(t) -> Optional[float]:
     return None
 
 
+def _sync_price_only(ticker: str) -> Optional[float]:
+    """Только цена через yfinance — без запроса метаданных."""
+    try:
+        import yfinance as yf
+
+        return _get_price_from_ticker(yf.Ticker(ticker))
+    except Exception as exc:
+        logger.debug("yfinance price %s: %s", ticker, exc)
+        return None
+
+
 def _sync_single(ticker: str) -> Optional[dict]:
     """Синхронное получение одного тикера с метаданными (для поиска)."""
     try:
@@ -135,13 +227,61 @@ def _sync_batch(tickers: list[str]) -> dict[str, float]:
 
 async def get_batch_prices(tickers: list[str]) -> dict[str, float]:
     """Асинхронный батч-запрос цен. Один вызов на 100+ тикеров."""
+    result, tickers = _price_cache.split(tickers)
     if not tickers:
-        return {}
+        return result
+
+    chunks  = [tickers[i:i + _SPARK_BATCH_SIZE] for i in range(0, len(tickers), _SPARK_BATCH_SIZE)]
+    fetched: dict[str, float] = {}
+    for part in await asyncio.gather(*(_fetch_spark(c) for c in chunks)):
+        fetched.update(part)
+
+    # Что spark не отдал — через yfinance (pandas), как раньше
+    missing = [t for t in tickers if t not in fetched]
+    if missing:
+        loop = asyncio.get_event_loop()
+        fetched.update(await loop.run_in_executor(_executor, _sync_batch, missing))
+
+    _price_cache.put(fetched)
+    result.update(fetched)
+    return result
+
+
+async def get_price(ticker: str) -> Optional[float]:
+    """Только последняя цена (без названия/биржи) — для мониторинга и переноса таргета."""
+    price = _meta_price(await fetch_chart_meta(ticker))
+    if price is not None:
+        return price
     loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(_executor, _sync_batch, tickers)
+    return await loop.run_in_executor(_executor, _sync_price_only, ticker)
 
 
-async def get_stock_price(ticker: str) -> Optional[dict]:
-    """Асинхронное получение цены одного тикера с метаданными."""
+def stock_from_meta(ticker: str, meta: Optional[dict]) -> Optional[dict]:
+    """Карточка тикера из meta chart API; None — в meta нет цены."""
+    price = _meta_price(meta)
+    if price is None:
+        return None
+    return {
+        "ticker":       ticker,
+        "company_name": meta.get("longName") or meta.get("shortName") or ticker,
+        "price":        price,
+        "currency":     meta.get("currency") or "",
+        "exchange":     meta.get("exchangeName") or "",
+    }
+
+
+async def get_stock_price_yf(ticker: str) -> Optional[dict]:
+    """
+    Fallback через yfinance в потоке (fast_info → history → t.info).
+    Задачу в пуле отменить нельзя — вызывать, только когда ответ действительно нужен.
+    """
     loop = asyncio.get_event_loop()
     return await loop.run_in_executor(_executor, _sync_single, ticker)
+
+
+async def get_stock_price(ticker: str) -> Optional[dict]:
+    """Асинхронное получение цены одного тикера с метаданными."""
+    stock = stock_from_meta(ticker, await fetch_chart_meta(ticker))
+    if stock is not None:
+        return stock
+    return await get_stock_price_yf(ticker)
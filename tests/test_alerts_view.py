@@ -0,0 +1,58 @@
+"""
+Кеш списка карточек (web/app.py, _alerts_view).
+
+Запуск: python -m unittest discover tests
+"""
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123:test")
+
+from web import app as web_app  # noqa: E402
+
+
+def _alert(alert_id: int, ticker: str) -> dict:
+    return {
+        "id": alert_id, "ticker": ticker, "company_name": ticker, "exchange": "NYSE",
+        "currency": "USD", "direction": "above", "current_price": 5.0,
+        "target_price": 10.0, "created_at": "2026-01-01 00:00:00",
+    }
+
+
+class AlertsViewCacheTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        web_app._invalidate_view()
+
+    async def test_read_overlapping_write_is_not_cached(self):
+        old_rows = [_alert(1, "OLD")]
+        new_rows = [_alert(1, "OLD"), _alert(2, "NEW")]
+        calls = []
+
+        async def fake_all_alerts(market="all"):
+            calls.append(market)
+            if len(calls) == 1:
+                # Запись (add_alert) завершилась, пока шло это чтение
+                web_app._invalidate_view()
+                return old_rows
+            return new_rows
+
+        with mock.patch.object(web_app, "_all_alerts", fake_all_alerts):
+            first  = await web_app._alerts_view("all", "original", {})
+            second = await web_app._alerts_view("all", "original", {})
+
+        self.assertEqual([a["ticker"] for a in first], ["OLD"])
+        self.assertEqual(sorted(a["ticker"] for a in second), ["NEW", "OLD"])
+        self.assertEqual(len(calls), 2)
+
+    async def test_repeated_reads_hit_cache(self):
+        fetch = mock.AsyncMock(return_value=[_alert(1, "AAA")])
+        with mock.patch.object(web_app, "_all_alerts", fetch):
+            await web_app._alerts_view("all", "original", {})
+            await web_app._alerts_view("all", "original", {})
+            await web_app._alerts_view("all", "USD", {})  # смена валюты — те же строки
+        fetch.assert_awaited_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
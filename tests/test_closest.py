@@ -0,0 +1,66 @@
+"""
+Экран «Близко к цели» (bot/handlers/closest.py).
+
+Запуск: python -m unittest discover tests
+"""
+import asyncio
+import os
+import unittest
+from types import SimpleNamespace
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123:test")
+
+from bot.handlers.closest import closest_handler  # noqa: E402
+
+
+def _alert(alert_id: int, ticker: str, current: float, target: float) -> dict:
+    return {
+        "id": alert_id, "ticker": ticker, "company_name": ticker, "exchange": "MOEX",
+        "currency": "RUB", "direction": "above",
+        "current_price": current, "target_price": target,
+    }
+
+
+class _FakeMessage:
+    """Записывает тексты в порядке доставки; ранние сообщения «идут» дольше."""
+
+    def __init__(self) -> None:
+        self.delivered: list[str] = []
+        self._calls = 0
+
+    async def reply_text(self, text: str, **kwargs) -> None:
+        self._calls += 1
+        await asyncio.sleep(0.05 / self._calls)
+        self.delivered.append(text)
+
+
+class _FakeDb:
+    def __init__(self, alerts: list[dict]) -> None:
+        self._alerts = alerts
+
+    async def get_user_alerts(self, user_id: int) -> list[dict]:
+        return self._alerts
+
+
+class ClosestOrderTest(unittest.IsolatedAsyncioTestCase):
+    async def test_cards_delivered_sorted_by_distance(self):
+        alerts = [
+            _alert(1, "FAR", 50.0, 100.0),    # 100% до цели
+            _alert(2, "NEAR", 99.0, 100.0),   # ~1%
+            _alert(3, "NOPRICE", 0.0, 100.0), # без цены — в конце
+            _alert(4, "MID", 80.0, 100.0),    # 25%
+        ]
+        message = _FakeMessage()
+        update  = SimpleNamespace(effective_user=SimpleNamespace(id=1), message=message)
+        context = SimpleNamespace(bot_data={"db": _FakeDb(alerts)})
+
+        await closest_handler.__wrapped__(update, context)
+
+        header, *cards = message.delivered
+        self.assertIn("Близко к цели", header)
+        order = [card.split("*")[1] for card in cards]
+        self.assertEqual(order, ["NEAR", "MID", "FAR", "NOPRICE"])
+
+
+if __name__ == "__main__":
+    unittest.main()
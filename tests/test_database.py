@@ -0,0 +1,153 @@
+"""
+Database (bot/database.py) на временном файле SQLite.
+
+Запуск: python -m unittest discover tests
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+
+from bot.database import Database
+
+
+def _row(ticker: str, exchange: str = "NYSE", target: float = 10.0,
+         direction: str = "above", user_id: int = 1) -> tuple:
+    """Кортеж в порядке колонок SQL_ADD_ALERT."""
+    return (user_id, ticker, exchange, f"{ticker} Inc", target, "USD", direction, 5.0)
+
+
+class DatabaseTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self._tmp.name, "test.db"), readers=2)
+        await self.db.init()
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        self._tmp.cleanup()
+
+
+class WriterLockTest(DatabaseTestCase):
+    async def test_failed_batch_does_not_roll_back_concurrent_update(self):
+        await self.db.add_alerts_many([_row("AAA")])
+        alert = (await self.db.get_all_active_alerts())[0]
+
+        bad_batch = [_row("BBB"), (1, None, "NYSE", "x", 1.0, "USD", "above", 1.0)]
+        update = self.db.update_alert_target(alert["id"], 1, 42.0, "above", 5.0)
+        results = await asyncio.gather(
+            self.db.add_alerts_many(bad_batch), update, return_exceptions=True
+        )
+
+        self.assertIsInstance(results[0], Exception)
+        self.assertEqual(results[1]["target_price"], 42.0)
+        fresh = await self.db.get_alert_by_id(alert["id"])
+        self.assertEqual(fresh["target_price"], 42.0)
+        tickers = [a["ticker"] for a in await self.db.get_all_active_alerts()]
+        self.assertEqual(tickers, ["AAA"])
+
+
+class UserSettingsTest(DatabaseTestCase):
+    async def test_defaults_on_first_upsert(self):
+        s = await self.db.upsert_user_settings(7)
+        self.assertEqual(
+            s, {"user_id": 7, "interval_ru": 60, "interval_us": 180, "display_currency": "original"}
+        )
+
+    async def test_partial_update_keeps_other_columns(self):
+        await self.db.upsert_user_settings(7, interval_ru=120, display_currency="RUB")
+        s = await self.db.upsert_user_settings(7, interval_us=600)
+        self.assertEqual(
+            s, {"user_id": 7, "interval_ru": 120, "interval_us": 600, "display_currency": "RUB"}
+        )
+
+    async def test_unchanged_upsert_returns_full_row(self):
+        await self.db.upsert_user_settings(7, interval_ru=300, display_currency="USD")
+        # Повторный клик: WHERE отсекает UPDATE, RETURNING пуст → перечитываем строку
+        s = await self.db.upsert_user_settings(7, display_currency="USD")
+        self.assertEqual(
+            s, {"user_id": 7, "interval_ru": 300, "interval_us": 180, "display_currency": "USD"}
+        )
+        self.assertEqual(await self.db.get_user_settings(7), s)
+
+    async def test_unchanged_upsert_writes_nothing(self):
+        await self.db.upsert_user_settings(7, interval_ru=300)
+        before = self.db._writer.total_changes
+        await self.db.upsert_user_settings(7, interval_ru=300)
+        await self.db.upsert_user_settings(7)
+        self.assertEqual(self.db._writer.total_changes, before)
+
+
+class AlertsWriteTest(DatabaseTestCase):
+    async def test_batch_insert_normalizes_exchange(self):
+        await self.db.add_alerts_many([_row("AAA", " nyse "), _row("SBER", "moex")])
+        rows = await self.db.get_all_active_alerts()
+        self.assertEqual(
+            sorted((r["ticker"], r["exchange"]) for r in rows),
+            [("AAA", "NYSE"), ("SBER", "MOEX")],
+        )
+
+    async def test_failed_batch_inserts_nothing(self):
+        with self.assertRaises(Exception):
+            await self.db.add_alerts_many(
+                [_row("AAA"), (1, None, "NYSE", "x", 1.0, "USD", "above", 1.0)]
+            )
+        self.assertEqual(await self.db.get_all_active_alerts(), [])
+
+    async def test_update_combined_targets(self):
+        await self.db.add_alerts_many([
+            _row("AAA", target=110.0, direction="above"),
+            _row("AAA", target=90.0, direction="below"),
+            _row("BBB", target=50.0),
+        ])
+        ids = {(r["ticker"], r["direction"]): r["id"] for r in await self.db.get_all_active_alerts()}
+        above, below = await self.db.update_combined_targets(
+            ids["AAA", "above"], ids["AAA", "below"], 120.0, 80.0, 100.0
+        )
+        self.assertEqual((above["target_price"], above["current_price"]), (120.0, 100.0))
+        self.assertEqual((below["target_price"], below["current_price"]), (80.0, 100.0))
+        # Третий алерт не задет
+        other = await self.db.get_alert_by_id(ids["BBB", "above"])
+        self.assertEqual((other["target_price"], other["current_price"]), (50.0, 5.0))
+
+    async def test_update_combined_targets_missing_id(self):
+        await self.db.add_alerts_many([_row("AAA")])
+        alert_id = (await self.db.get_all_active_alerts())[0]["id"]
+        above, below = await self.db.update_combined_targets(alert_id, 9999, 20.0, 1.0, 10.0)
+        self.assertEqual(above["target_price"], 20.0)
+        self.assertIsNone(below)
+
+
+class DueAlertsTest(DatabaseTestCase):
+    async def test_interval_by_exchange_and_user_settings(self):
+        await self.db.upsert_user_settings(1, interval_ru=120, interval_us=600)
+        await self.db.add_alerts_many([
+            _row("SBER", "MOEX", user_id=1),
+            _row("AAPL", "NASDAQ", user_id=1),
+            _row("GAZP", "MOEX", user_id=2),    # без настроек: 60 / 180
+            _row("MSFT", "NASDAQ", user_id=2),
+        ])
+        ids = {r["ticker"]: r["id"] for r in await self.db.get_all_active_alerts()}
+        now = 1_000_000.0
+        await self.db.update_alert_checks_batch(
+            [(1.0, alert_id) for alert_id in ids.values()], checked_at=now
+        )
+
+        async def due(elapsed: float) -> set[str]:
+            return {r["ticker"] for r in await self.db.get_due_alerts(now + elapsed)}
+
+        self.assertEqual(await due(59), set())
+        self.assertEqual(await due(60), {"GAZP"})
+        self.assertEqual(await due(120), {"GAZP", "SBER"})
+        self.assertEqual(await due(180), {"GAZP", "SBER", "MSFT"})
+        self.assertEqual(await due(600), {"GAZP", "SBER", "MSFT", "AAPL"})
+
+    async def test_never_checked_is_due_and_inactive_is_not(self):
+        await self.db.add_alerts_many([_row("AAA"), _row("BBB")])
+        ids = {r["ticker"]: r["id"] for r in await self.db.get_all_active_alerts()}
+        await self.db.deactivate_alert(ids["BBB"])
+        self.assertEqual([r["ticker"] for r in await self.db.get_due_alerts(1000.0)], ["AAA"])
+
+
+if __name__ == "__main__":
+    unittest.main()
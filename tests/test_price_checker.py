@@ -0,0 +1,107 @@
+"""
+Тик мониторинга Yahoo/MOEX (bot/services/price_checker.py, _run_yahoo_moex).
+
+Запуск: python -m unittest discover tests
+"""
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123:test")
+
+from bot.services import price_checker  # noqa: E402
+
+NOW = 1_000_000.0
+
+
+def _alert(alert_id: int, ticker: str, exchange: str, direction: str, target: float,
+           user_id: int = 1) -> dict:
+    return {
+        "id": alert_id, "user_id": user_id, "ticker": ticker, "exchange": exchange,
+        "company_name": ticker, "currency": "RUB" if exchange == "MOEX" else "USD",
+        "direction": direction, "target_price": target,
+    }
+
+
+class _FakeDb:
+    def __init__(self) -> None:
+        self.batches:     list[tuple[list, float]] = []
+        self.deactivated: list[int] = []
+
+    async def update_alert_checks_batch(self, rows, checked_at=None) -> None:
+        self.batches.append((list(rows), checked_at))
+
+    async def deactivate_alert(self, alert_id: int) -> None:
+        self.deactivated.append(alert_id)
+
+
+class _FakeBot:
+    def __init__(self) -> None:
+        self.sent: list[tuple[int, str]] = []
+
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> None:
+        self.sent.append((chat_id, text))
+
+
+class RunYahooMoexTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.alerts = [
+            _alert(1, "AAPL", "NASDAQ", "above", 150.0),   # сработает (160 ≥ 150)
+            _alert(2, "AAPL", "NASDAQ", "above", 200.0),   # нет
+            _alert(3, "AAPL", "NASDAQ", "below", 170.0),   # сработает (160 ≤ 170)
+            _alert(4, "SBER", "MOEX",   "below", 300.0),   # сработает (280 ≤ 300)
+            _alert(5, "GAZP", "MOEX",   "above", 200.0),   # нет цены — пропуск
+        ]
+        self.yahoo = mock.AsyncMock(return_value={"AAPL": 160.0})
+        self.moex  = mock.AsyncMock(return_value={"SBER": 280.0})
+        self.db    = _FakeDb()
+        self.bot   = _FakeBot()
+        for target, value in (
+            ("yahoo_batch", self.yahoo),
+            ("moex_batch", self.moex),
+            ("ALLOWED_USER_IDS", []),
+        ):
+            patcher = mock.patch.object(price_checker, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def _tick(self, market_open: bool) -> None:
+        with mock.patch.object(price_checker, "is_market_open", return_value=market_open):
+            await price_checker._run_yahoo_moex(self.bot, self.db, self.alerts, NOW)
+
+    async def test_prices_written_once_per_alert_in_one_batch(self):
+        await self._tick(market_open=True)
+
+        # Каждый тикер запрошен один раз, несмотря на несколько алертов
+        self.yahoo.assert_awaited_once_with(["AAPL"])
+        self.moex.assert_awaited_once()
+        self.assertEqual(sorted(self.moex.await_args.args[0]), ["GAZP", "SBER"])
+
+        self.assertEqual(len(self.db.batches), 1)
+        rows, checked_at = self.db.batches[0]
+        self.assertEqual(checked_at, NOW)
+        self.assertEqual(
+            sorted(rows, key=lambda r: r[1]),
+            [(160.0, 1), (160.0, 2), (160.0, 3), (280.0, 4)],
+        )
+
+    async def test_triggered_alerts_deactivated_and_notified_once(self):
+        await self._tick(market_open=True)
+
+        self.assertEqual(sorted(self.db.deactivated), [1, 3, 4])
+        self.assertEqual(len(self.bot.sent), 3)
+        notified = sorted(text.split("*")[1] for _, text in self.bot.sent)
+        self.assertEqual(notified, ["AAPL", "AAPL", "SBER"])
+        self.assertTrue(all(chat_id == 1 for chat_id, _ in self.bot.sent))
+
+    async def test_closed_market_writes_prices_without_notifying(self):
+        await self._tick(market_open=False)
+
+        rows, _ = self.db.batches[0]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(self.db.deactivated, [])
+        self.assertEqual(self.bot.sent, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
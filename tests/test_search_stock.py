@@ -0,0 +1,76 @@
+"""
+Поиск тикера по источникам (web/app.py, _find_stock).
+
+Запуск: python -m unittest discover tests
+"""
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123:test")
+
+from web import app as web_app  # noqa: E402
+
+_MOEX_STOCK = {
+    "ticker": "SBER", "company_name": "Сбербанк", "price": 300.0,
+    "currency": "RUB", "exchange": "MOEX",
+}
+
+
+def _async(result=None):
+    return mock.AsyncMock(return_value=result)
+
+
+class FindStockTest(unittest.IsolatedAsyncioTestCase):
+    async def test_moex_hit_skips_yfinance_executor(self):
+        with mock.patch.object(web_app, "moex_price", _async(_MOEX_STOCK)), \
+             mock.patch.object(web_app, "td_price", _async()) as td, \
+             mock.patch.object(web_app, "fetch_chart_meta", _async()), \
+             mock.patch.object(web_app, "get_stock_price_yf", _async()) as yf:
+            stock = await web_app._find_stock("SBER")
+        self.assertEqual(stock["exchange"], "MOEX")
+        td.assert_not_awaited()
+        yf.assert_not_awaited()
+
+    async def test_chart_meta_used_before_executor(self):
+        meta = {"regularMarketPrice": 10.0, "longName": "Tencent",
+                "currency": "HKD", "exchangeName": "HKG"}
+        with mock.patch.object(web_app, "moex_price", _async()), \
+             mock.patch.object(web_app, "td_price", _async()), \
+             mock.patch.object(web_app, "fetch_chart_meta", _async(meta)), \
+             mock.patch.object(web_app, "get_stock_price_yf", _async()) as yf:
+            stock = await web_app._find_stock("0700.HK")
+        self.assertEqual((stock["exchange"], stock["currency"]), ("HKEX", "HKD"))
+        yf.assert_not_awaited()
+
+    async def test_executor_only_after_all_misses(self):
+        with mock.patch.object(web_app, "moex_price", _async()), \
+             mock.patch.object(web_app, "td_price", _async()), \
+             mock.patch.object(web_app, "fetch_chart_meta", _async()), \
+             mock.patch.object(web_app, "get_stock_price_yf", _async()) as yf:
+            self.assertIsNone(await web_app._find_stock("NOPE"))
+        yf.assert_awaited_once_with("NOPE")
+
+    async def test_slow_chart_request_is_cancelled_on_moex_hit(self):
+        cancelled = asyncio.Event()
+
+        async def slow_meta(symbol):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def moex(ticker):
+            await asyncio.sleep(0.01)  # chart-запрос успевает стартовать
+            return _MOEX_STOCK
+
+        with mock.patch.object(web_app, "moex_price", moex), \
+             mock.patch.object(web_app, "fetch_chart_meta", slow_meta):
+            await web_app._find_stock("SBER")
+            await asyncio.wait_for(cancelled.wait(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+"""
+Валидация Telegram initData (web/app.py).
+
+Запуск: python -m unittest discover tests
+"""
+import hashlib
+import hmac
+import os
+import time
+import unittest
+from urllib.parse import urlencode
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123:test")
+
+from web import app as web_app  # noqa: E402
+
+
+def _signed(params: dict) -> str:
+    """initData с корректной подписью для текущего _TG_SECRET_KEY."""
+    data_check = "\n".join(f"{k}={v}" for k, v in sorted(params.items()))
+    sig = hmac.new(web_app._TG_SECRET_KEY, data_check.encode(), hashlib.sha256).hexdigest()
+    return urlencode({**params, "hash": sig})
+
+
+class ValidateInitDataTest(unittest.TestCase):
+    def test_valid_signature(self):
+        init_data = _signed({"auth_date": str(int(time.time())), "user": '{"id": 1}'})
+        self.assertEqual(web_app.validate_telegram_init_data(init_data), {"id": 1})
+
+    def test_non_ascii_digit_auth_date_rejected(self):
+        # «²» — isdigit() == True, но int("²") бросает ValueError
+        for raw in ("²", "1²", "١٢٣"):
+            with self.subTest(auth_date=raw):
+                init_data = urlencode({"auth_date": raw, "user": "{}", "hash": "00"})
+                self.assertIsNone(web_app.validate_telegram_init_data(init_data))
+
+    def test_percent_encoded_superscript(self):
+        self.assertIsNone(
+            web_app.validate_telegram_init_data("auth_date=%C2%B2&user=%7B%7D&hash=00")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,20 +7,27 @@ FastAPI веб-приложение — Trade Alerts Interface.
     (первый в ALLOWED_USER_IDS из .env)
   - user_id нужен только для роутинга Telegram-уведомлений, не для доступа
 """
+import asyncio
 import hashlib
 import hmac
+import itertools
 import json
 import os
 import logging
+import math
+import re
 import time
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+from functools import lru_cache
+from operator import itemgetter
 from typing import Optional
 from urllib.parse import parse_qsl
 
 from fastapi import FastAPI, Request, Form, Cookie, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
+import jinja2
+import numpy as np
 from itsdangerous import URLSafeTimedSerializer, BadSignature
 
 from fastapi import UploadFile, File
@@ -28,8 +35,9 @@ from bot.config import PRIMARY_USER_ID, ALLOWED_USER_IDS, TELEGRAM_BOT_TOKEN
 from bot.database import Database
 from bot.services.moex import get_stock_price as moex_price
 from bot.services.twelvedata import get_stock_price as td_price, budget_status
-from bot.services.yahoo import get_stock_price as yahoo_price
-from bot.services.forex import get_rates, convert as fx_convert
+from bot.services.yahoo import fetch_chart_meta, get_stock_price_yf, stock_from_meta
+from bot.services.forex import get_rates, keep_fresh as keep_rates_fresh, convert as fx_convert
+from bot.services.http import close_session
 
 logger = logging.getLogger(__name__)
 
@@ -63,37 +71,83 @@ _YAHOO_EXCHANGE: dict[str, str] = {
     "ASE": "NYSE MKT",
     "CBT": "CBOE", "BTS": "CBOE",
 }
+# Допустимый тикер: латиница, цифры, точка и дефис, до 20 символов
+_TICKER_RE = re.compile(r"[A-Z0-9.\-]{1,20}\Z")
+
 _YAHOO_CURRENCY: dict[str, str] = {
     "HKEX": "HKD", "HKSE": "HKD",
 }
 
+# Код Yahoo → (наша биржа, валюта по умолчанию) одним поиском.
+# Пустой код — NYSE; неизвестные коды проходят как есть
+_YAHOO_INFO: dict[str, tuple[str, str]] = {
+    raw: (ex, _YAHOO_CURRENCY.get(ex, "USD"))
+    for raw, ex in {**_YAHOO_EXCHANGE, "": "NYSE"}.items()
+}
+
+
+# Найденные тикеры: повторный поиск того же тикера (форма добавления, импорт)
+# не ходит к провайдерам и не тратит кредит TwelveData. Цена в ответе может
+# отстать не больше чем на TTL; промахи не кешируются
+_SEARCH_CACHE_TTL_SEC = 60.0
+_SEARCH_CACHE_MAX     = 1024
+_search_cache: dict[str, tuple[float, dict]] = {}  # тикер → (monotonic-время, результат)
+
 
 async def _search_stock(ticker: str) -> Optional[dict]:
+    """Как _find_stock, но с кешем удачных результатов на _SEARCH_CACHE_TTL_SEC.
+
+    Возвращаемый dict общий для всех вызовов — не изменять.
     """
-    Ищет тикер: MOEX → TwelveData → Yahoo Finance.
-    Возвращает нормализованный dict или None.
-    """
-    # 1. MOEX ISS (бесплатно, без кредитов)
-    stock = await moex_price(ticker)
+    hit = _search_cache.get(ticker)
+    if hit is not None and time.monotonic() - hit[0] < _SEARCH_CACHE_TTL_SEC:
+        return hit[1]
+    stock = await _find_stock(ticker)
     if stock:
-        return stock
+        if len(_search_cache) >= _SEARCH_CACHE_MAX:
+            _search_cache.clear()
+        _search_cache[ticker] = (time.monotonic(), stock)
+    return stock
 
-    # 2. TwelveData /quote (1 кредит)
-    stock = await td_price(ticker)
-    if stock:
-        return stock
 
-    # 3. Yahoo Finance — для HK (.HK), ETF и прочих
-    stock = await yahoo_price(ticker)
+async def _find_stock(ticker: str) -> Optional[dict]:
+    """
+    Ищет тикер: MOEX → TwelveData → Yahoo Finance.
+    Возвращает нормализованный dict или None.
+
+    Приоритет источников сохраняется, но бесплатный chart API Yahoo (один
+    aiohttp-запрос, отменяется честно) стартует сразу вместе с MOEX.
+    TwelveData тратит кредит — его зовём только после промаха MOEX, а
+    yfinance в потоке (отменить нельзя) — только после промаха обоих.
+    """
+    meta_task = asyncio.create_task(fetch_chart_meta(ticker))
+    try:
+        # 1. MOEX ISS (бесплатно, без кредитов)
+        stock = await moex_price(ticker)
+        if stock:
+            return stock
+
+        # 2. TwelveData /quote (1 кредит)
+        stock = await td_price(ticker)
+        if stock:
+            return stock
+
+        # 3. Yahoo Finance — для HK (.HK), ETF и прочих
+        stock = stock_from_meta(ticker, await meta_task)
+    finally:
+        meta_task.cancel()
+    if stock is None:
+        stock = await get_stock_price_yf(ticker)
     if not stock:
         return None
 
     # Нормализуем биржу из Yahoo-кода
-    raw_ex  = stock.get("exchange", "")
-    exchange = _YAHOO_EXCHANGE.get(raw_ex, raw_ex) or "NYSE"
+    raw_ex = stock.get("exchange") or ""
+    info   = _YAHOO_INFO.get(raw_ex)
+    exchange, default_cur = info or (raw_ex, _YAHOO_CURRENCY.get(raw_ex, "USD"))
 
     # Валюта: если Yahoo вернул пустую — берём по бирже
-    currency = stock.get("currency") or _YAHOO_CURRENCY.get(exchange, "USD")
+    currency = stock.get("currency") or default_cur
 
     return {
         "ticker":       stock["ticker"],
@@ -109,15 +163,61 @@ async def _search_stock(ticker: str) -> Optional[dict]:
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await db.init()
+    # Курсы обновляются в фоне заранее — запросы с конвертацией их не ждут
+    rates_task = asyncio.create_task(keep_rates_fresh())
     yield
+    rates_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await rates_task
+    await db.close()
+    await close_session()
 
 
 app = FastAPI(lifespan=lifespan)
 
 _BASE     = os.path.dirname(os.path.abspath(__file__))
-templates = Jinja2Templates(directory=os.path.join(_BASE, "templates"))
+# Шаблоны меняются только с деплоем: auto_reload=False убирает stat() файла на
+# каждый get_template, а байткод-кеш — перекомпиляцию при рестарте процесса
+_TEMPLATES_AUTO_RELOAD = os.getenv("TEMPLATES_AUTO_RELOAD", "0") == "1"
+_jinja_env = jinja2.Environment(
+    loader=jinja2.FileSystemLoader(os.path.join(_BASE, "templates")),
+    autoescape=True,
+    auto_reload=_TEMPLATES_AUTO_RELOAD,
+    bytecode_cache=jinja2.FileSystemBytecodeCache(),
+)
 app.mount("/static", StaticFiles(directory=os.path.join(_BASE, "static")), name="static")
 
+# Все шаблоны компилируются один раз при импорте; хендлеры рендерят их
+# напрямую — без поиска по имени и обёртки TemplateResponse.
+# request в контекст не нужен: url_for в шаблонах не используется
+_TEMPLATES = {name: _jinja_env.get_template(name) for name in _jinja_env.list_templates()}
+
+
+def _render(name: str, context: dict, status_code: int = 200) -> HTMLResponse:
+    tpl = _jinja_env.get_template(name) if _TEMPLATES_AUTO_RELOAD else _TEMPLATES[name]
+    return HTMLResponse(tpl.render(context), status_code=status_code)
+
+
+@lru_cache(maxsize=None)
+def _static_html(name: str) -> bytes:
+    return _TEMPLATES[name].render().encode("utf-8")
+
+
+def _render_static(name: str) -> HTMLResponse:
+    """Шаблон без контекста (логин, форма добавления): рендерится один раз,
+    дальше отдаются готовые байты."""
+    if _TEMPLATES_AUTO_RELOAD:
+        return _render(name, {})
+    return HTMLResponse(_static_html(name))
+
+
+# Пустые ответы (нет сессии, алерт не найден, нечего рендерить) — общие
+# экземпляры: тело и заголовки готовы заранее, на запрос ничего не создаётся.
+# Заголовки у них не трогать — ответ с HX-*/cookie создаётся отдельно
+_EMPTY     = HTMLResponse("")
+_EMPTY_401 = HTMLResponse("", status_code=401)
+_EMPTY_404 = HTMLResponse("", status_code=404)
+
 
 # ─── Сессии ──────────────────────────────────────────────────────────────────
 
@@ -125,14 +225,30 @@ def make_session() -> str:
     return signer.dumps({"auth": True})
 
 
+# Проверенные cookie: HTMX шлёт пачки запросов с одной и той же сессией, а
+# signer.loads — это base64 + HMAC + JSON. Кешируются только валидные cookie
+# (мусорными нельзя раздуть кеш); при переполнении кеш просто очищается
+_AUTH_CACHE_TTL_SEC = 60.0
+_AUTH_CACHE_MAX     = 4096
+_auth_cache: dict[str, float] = {}  # cookie → monotonic-время, до которого верим
+
+
 def is_authenticated(session: Optional[str]) -> bool:
     if not session:
         return False
+    now = time.monotonic()
+    if _auth_cache.get(session, 0.0) > now:
+        return True
     try:
         data = signer.loads(session, max_age=86400 * 30)
-        return bool(data.get("auth"))
+        ok   = bool(data.get("auth"))
     except (BadSignature, Exception):
         return False
+    if ok:
+        if len(_auth_cache) >= _AUTH_CACHE_MAX:
+            _auth_cache.clear()
+        _auth_cache[session] = now + _AUTH_CACHE_TTL_SEC
+    return ok
 
 
 def auth_redirect():
@@ -152,6 +268,14 @@ def _set_session_cookie(response, max_age: int = 86400 * 30) -> None:
 
 # ─── Telegram Mini App validation ────────────────────────────────────────────
 
+# secret_key зависит только от токена бота — считаем один раз при импорте
+_TG_SECRET_KEY: Optional[bytes] = hmac.new(
+    b"WebAppData",
+    TELEGRAM_BOT_TOKEN.encode("utf-8"),
+    hashlib.sha256,
+).digest() if TELEGRAM_BOT_TOKEN else None
+
+
 def validate_telegram_init_data(init_data: str) -> Optional[dict]:
     """
     Валидация Telegram WebApp initData по официальному алгоритму.
@@ -165,7 +289,7 @@ def validate_telegram_init_data(init_data: str) -> Optional[dict]:
 
     Возвращает словарь user из initData или None при ошибке.
     """
-    if not TELEGRAM_BOT_TOKEN or not init_data:
+    if not _TG_SECRET_KEY or not init_data:
         return None
 
     try:
@@ -178,7 +302,12 @@ def validate_telegram_init_data(init_data: str) -> Optional[dict]:
         return None
 
     # Проверяем актуальность данных (не старше 24 часов)
-    auth_date = int(params.get("auth_date", 0))
+    raw_date = params.get("auth_date", "")
+    # isdigit() без isascii() пропускает «²» и прочие цифры Юникода,
+    # на которых int() падает с ValueError
+    if not (raw_date.isascii() and raw_date.isdigit()):
+        return None  # без валидного auth_date подпись не проверяем
+    auth_date = int(raw_date)
     if time.time() - auth_date > 86400:
         logger.warning("Telegram initData просрочены (auth_date=%d)", auth_date)
         return None
@@ -189,14 +318,8 @@ def validate_telegram_init_data(init_data: str) -> Optional[dict]:
     )
 
     # Вычисляем подпись
-    secret_key = hmac.new(
-        b"WebAppData",
-        TELEGRAM_BOT_TOKEN.encode("utf-8"),
-        hashlib.sha256,
-    ).digest()
-
     calculated = hmac.new(
-        secret_key,
+        _TG_SECRET_KEY,
         data_check_string.encode("utf-8"),
         hashlib.sha256,
     ).hexdigest()
@@ -218,6 +341,56 @@ def validate_telegram_init_data(init_data: str) -> Optional[dict]:
 
 # ─── Утилиты ─────────────────────────────────────────────────────────────────
 
+# Цвет прогресс-бара: [direction == "above"][число пройденных порогов 88% и 97%]
+_PROGRESS_COLORS = (
+    ("below", "below-close", "below-reached"),
+    ("above", "above-close", "above-reached"),
+)
+
+# С какого числа алертов pct/dist_pct считаются векторно через NumPy
+# (тот же порог, что в bot/handlers/closest.py)
+_NUMPY_MIN_ALERTS = 50
+
+
+def _progress(a) -> tuple[Optional[float], Optional[float]]:
+    """(pct, dist_pct) одного алерта; None — если цены не позволяют посчитать."""
+    current_raw = a["current_price"]
+    target_raw  = a["target_price"]
+
+    pct = None
+    if current_raw and target_raw and target_raw > 0 and current_raw > 0:
+        pct = min(100.0, (current_raw / target_raw * 100) if a["direction"] == "above"
+                  else (target_raw / current_raw * 100))
+
+    dist_pct = None
+    if current_raw and target_raw and current_raw > 0:
+        dist_pct = abs((target_raw - current_raw) / current_raw * 100)
+    return pct, dist_pct
+
+
+def _progress_batch(alerts: list) -> list[tuple[Optional[float], Optional[float]]]:
+    """То же, что _progress для каждого алерта, но одним векторным проходом."""
+    if len(alerts) < _NUMPY_MIN_ALERTS:
+        return [_progress(a) for a in alerts]
+
+    n       = len(alerts)
+    current = np.fromiter((a["current_price"] or np.nan for a in alerts), dtype=np.float64, count=n)
+    target  = np.fromiter((a["target_price"]  or np.nan for a in alerts), dtype=np.float64, count=n)
+    above   = np.fromiter((a["direction"] == "above" for a in alerts), dtype=bool, count=n)
+
+    # NaN в сравнениях даёт False — пустые/нулевые цены отсекаются масками
+    pct_ok  = (current > 0) & (target > 0)
+    dist_ok = (current > 0) & ~np.isnan(target)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct      = np.minimum(np.where(above, current / target, target / current) * 100, 100.0)
+        dist_pct = np.abs((target - current) / current) * 100
+
+    return [
+        (p if ok else None, d if dk else None)
+        for ok, p, dk, d in zip(pct_ok.tolist(), pct.tolist(), dist_ok.tolist(), dist_pct.tolist())
+    ]
+
+
 def _enrich(
     alerts: list[dict],
     display_currency: str = "original",
@@ -225,43 +398,35 @@ def _enrich(
 ) -> list[dict]:
     result = []
     rates = rates or {}
-    for a in alerts:
-        orig_currency = a["currency"]
-        current_raw   = a.get("current_price")
-        target_raw    = a["target_price"]
-        direction     = a["direction"]
-
-        # Конвертация в валюту отображения
-        if current_raw and display_currency != "original":
-            current_conv, disp_cur = fx_convert(current_raw, orig_currency, display_currency, rates)
-        else:
-            current_conv, disp_cur = current_raw, orig_currency
-
-        target_conv, _ = fx_convert(target_raw, orig_currency, display_currency, rates) \
-            if display_currency != "original" else (target_raw, orig_currency)
+    dir_label = DIRECTION_LABEL.get
 
-        sym = CURRENCY_SYM.get(disp_cur, disp_cur)
+    # Множитель и символ валюты отображения — один раз на исходную валюту,
+    # а не два fx_convert на каждый алерт
+    conv: dict[str, tuple[float, str]] = {}
+    for cur in {a["currency"] for a in alerts}:
+        factor, disp_cur = fx_convert(1.0, cur, display_currency, rates)
+        conv[cur] = (factor, CURRENCY_SYM.get(disp_cur, disp_cur))
 
-        pct = None
-        if current_raw and target_raw and target_raw > 0 and current_raw > 0:
-            pct = min(100.0, (current_raw / target_raw * 100) if direction == "above"
-                      else (target_raw / current_raw * 100))
+    for a, (pct, dist_pct) in zip(alerts, _progress_batch(alerts)):
+        current_raw = a["current_price"]
+        direction   = a["direction"]
 
-        dist_pct = None
-        if current_raw and target_raw and current_raw > 0:
-            dist_pct = abs((target_raw - current_raw) / current_raw * 100)
+        # Конвертация в валюту отображения
+        factor, sym  = conv[a["currency"]]
+        current_conv = current_raw * factor if current_raw else current_raw
+        target_conv  = a["target_price"] * factor
 
         if pct is None:
             color = "normal"
-        elif direction == "above":
-            color = "above-reached" if pct >= 97 else "above-close" if pct >= 88 else "above"
         else:
-            color = "below-reached" if pct >= 97 else "below-close" if pct >= 88 else "below"
+            color = _PROGRESS_COLORS[direction == "above"][(pct >= 88) + (pct >= 97)]
 
+        # Строки БД неизменяемы — здесь единственная копия алерта;
+        # дальше (_group_alerts_for_display, хендлеры) dict правится на месте
         result.append({
             **a,
             "sym":            sym,
-            "dir_label":      DIRECTION_LABEL.get(direction, ""),
+            "dir_label":      dir_label(direction, ""),
             "current_fmt":    f"{current_conv:.2f} {sym}" if current_conv else "—",
             "target_fmt":     f"{target_conv:.2f} {sym}",
             "progress_pct":   round(pct, 1) if pct is not None else None,
@@ -281,6 +446,7 @@ def _group_alerts_for_display(enriched: list[dict]) -> list[dict]:
     Если у тикера есть и 'above', и 'below' — объединяет их в одну combined-карточку.
     Лишние алерты (третий и далее с тем же тикером) добавляются как отдельные карточки.
     Порядок определяется первым вхождением тикера.
+    Изменяет переданные dict'ы (результат _enrich) на месте — без копий.
     """
     ticker_order: list[str] = []
     ticker_groups: dict[str, list[dict]] = {}
@@ -294,57 +460,172 @@ def _group_alerts_for_display(enriched: list[dict]) -> list[dict]:
     result: list[dict] = []
     for ticker in ticker_order:
         group = ticker_groups[ticker]
-        above = next((a for a in group if a["direction"] == "above"), None)
-        below = next((a for a in group if a["direction"] == "below"), None)
-
-        if above and below:
-            dist_vals = [x for x in [above.get("dist_pct"), below.get("dist_pct")] if x is not None]
-            combined = {
-                **above,
-                "is_combined":          True,
-                "id_above":             above["id"],
-                "id_below":             below["id"],
-                "target_above_fmt":     above["target_fmt"],
-                "target_above_price":   above["target_price"],
-                "progress_above_pct":   above["progress_pct"],
-                "dist_above_pct":       above["dist_pct"],
-                "progress_above_color": above["progress_color"],
-                "target_below_fmt":     below["target_fmt"],
-                "target_below_price":   below["target_price"],
-                "progress_below_pct":   below["progress_pct"],
-                "dist_below_pct":       below["dist_pct"],
-                "progress_below_color": below["progress_color"],
-                # Для сортировки по близости — берём минимальное расстояние
-                "dist_pct": min(dist_vals) if dist_vals else None,
-            }
-            result.append(combined)
-            # Добавляем лишние алерты того же тикера (если вдруг есть больше 2)
+
+        # Один проход: первый above, первый below, остальное — отдельные карточки
+        above = below = None
+        extras: list[dict] = []
+        for a in group:
+            d = a["direction"]
+            if d == "above" and above is None:
+                above = a
+            elif d == "below" and below is None:
+                below = a
+            else:
+                extras.append(a)
+
+        if above is None or below is None:
             for a in group:
-                if a["id"] not in (above["id"], below["id"]):
-                    result.append({**a, "is_combined": False})
+                a["is_combined"] = False
+            result.extend(group)
+            continue
+
+        dist_above = above["dist_pct"]
+        dist_below = below["dist_pct"]
+        if dist_above is None:
+            dist_min = dist_below
+        elif dist_below is None:
+            dist_min = dist_above
         else:
-            for a in group:
-                result.append({**a, "is_combined": False})
+            dist_min = min(dist_above, dist_below)
+
+        # above дальше нигде не нужен отдельно — дописываем поля прямо в него
+        above.update({
+            "is_combined":          True,
+            "id_above":             above["id"],
+            "id_below":             below["id"],
+            "target_above_fmt":     above["target_fmt"],
+            "target_above_price":   above["target_price"],
+            "progress_above_pct":   above["progress_pct"],
+            "dist_above_pct":       dist_above,
+            "progress_above_color": above["progress_color"],
+            "target_below_fmt":     below["target_fmt"],
+            "target_below_price":   below["target_price"],
+            "progress_below_pct":   below["progress_pct"],
+            "dist_below_pct":       dist_below,
+            "progress_below_color": below["progress_color"],
+            # Для сортировки по близости — берём минимальное расстояние
+            "dist_pct": dist_min,
+        })
+        result.append(above)
+        # Лишние алерты того же тикера (если вдруг есть больше 2)
+        for a in extras:
+            a["is_combined"] = False
+        result.extend(extras)
 
     return result
 
 
+_TV_BASE = "https://www.tradingview.com/symbols/"
+_TV_PREFIX: dict[str, str] = {"MOEX": _TV_BASE + "MOEX-"}
+_HK_EXCHANGES = ("HKEX", "HKSE")
+
+# (ticker, exchange) ограничено числом алертов; карточки рендерятся постоянно
+_TV_URL_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=_TV_URL_CACHE_SIZE)
 def _tradingview_url(ticker: str, exchange: str) -> str:
-    if exchange == "MOEX":
-        return f"https://www.tradingview.com/symbols/MOEX-{ticker}/"
-    if exchange in ("HKEX", "HKSE"):
+    if exchange in _HK_EXCHANGES:
         # Yahoo Finance: 0700.HK → TradingView: HKEX-700 (strip .HK, remove leading zeros)
         try:
             tv_ticker = str(int(ticker.upper().replace(".HK", "")))
         except ValueError:
             tv_ticker = ticker.replace(".HK", "")
-        return f"https://www.tradingview.com/symbols/HKEX-{tv_ticker}/"
-    return f"https://www.tradingview.com/symbols/{ticker}/"
+        return f"{_TV_BASE}HKEX-{tv_ticker}/"
+    return _TV_PREFIX.get(exchange, _TV_BASE) + ticker + "/"
+
+
+async def _all_alerts(market: str = "all") -> list:
+    """Все активные алерты из базы (без фильтра по user_id).
 
+    Строки читаются потоком и сразу фильтруются по рынку — отброшенные
+    не копятся в памяти и не проходят через _enrich.
+    """
+    flt = _MARKET_FILTERS.get(market)
+    if flt is None:
+        return await db.get_all_active_alerts_web()
+    exchanges, include = flt
+    return [a async for a in db.iter_all_active_alerts_web() if (a["exchange"] in exchanges) is include]
+
+
+async def _no_rates() -> dict:
+    return {}
+
+
+async def _display_ctx() -> tuple[str, dict]:
+    """
+    Валюта отображения PRIMARY_USER_ID и курсы для неё.
+    Оба источника уже кешированы (настройки — в Database, курсы — в forex),
+    так что на горячем пути это два обращения к памяти.
+    """
+    s        = await db.get_user_settings(PRIMARY_USER_ID)
+    disp_cur = s.get("display_currency", "original")
+    rates    = await get_rates() if disp_cur != "original" else {}
+    return disp_cur, rates
 
-async def _all_alerts() -> list[dict]:
-    """Все активные алерты из базы (без фильтра по user_id)."""
-    return await db.get_all_active_alerts_web()
+
+# Готовый (обогащённый и сгруппированный) список карточек: HTMX-опрос раз в
+# 60 с и несколько вкладок читают одно и то же. Свои изменения веб сбрасывает
+# сразу (_invalidate_view); TTL — потому что цены и срабатывания пишет бот
+_VIEW_TTL_SEC = 10.0
+# (market, display_currency) → (monotonic-время, курсы, карточки)
+_view_cache: dict[tuple[str, str], tuple[float, dict, list[dict]]] = {}
+# market → (monotonic-время, строки БД): от валюты отображения строки не
+# зависят, и переключение валюты пересчитывает карточки без запроса к базе
+_rows_cache: dict[str, tuple[float, list]] = {}
+# Поколение кешей: _invalidate_view его увеличивает. Чтение, во время
+# которого прошла запись, свой (уже устаревший) результат не сохраняет
+_view_gen = 0
+
+
+async def _alerts_view(market: str, disp_cur: str, rates: dict) -> list[dict]:
+    """
+    Карточки для списка алертов. Возвращается новый list (его можно сортировать),
+    но dict'ы карточек общие для всех запросов — не изменять.
+    """
+    key = (market, disp_cur)
+    hit = _view_cache.get(key)
+    # Курсы сравниваем по объекту: forex отдаёт один и тот же dict, пока не обновит
+    if (
+        hit is not None
+        and time.monotonic() - hit[0] < _VIEW_TTL_SEC
+        and (hit[1] is rates or not (hit[1] or rates))
+    ):
+        return list(hit[2])
+
+    gen  = _view_gen
+    rows = _rows_cache.get(market)
+    if rows is not None and time.monotonic() - rows[0] < _VIEW_TTL_SEC:
+        ts, alerts = rows
+    else:
+        ts, alerts = time.monotonic(), await _all_alerts(market)
+        if gen != _view_gen:
+            # Пока читали, веб что-то записал — строки могли не увидеть запись
+            return _group_alerts_for_display(_enrich(alerts, disp_cur, rates))
+        _rows_cache[market] = (ts, alerts)
+
+    # Карточки живут не дольше строк, из которых собраны
+    grouped = _group_alerts_for_display(_enrich(alerts, disp_cur, rates))
+    _view_cache[key] = (ts, rates, grouped)
+    return list(grouped)
+
+
+def _invalidate_view() -> None:
+    global _view_gen
+    _view_gen += 1
+    _view_cache.clear()
+    _rows_cache.clear()
+
+
+# Соль меняется при каждом старте процесса: после деплоя (новые шаблоны)
+# старые ETag браузера гарантированно не совпадут
+_ETAG_SALT = f"{time.time_ns():x}"
+
+
+def _row_etag(row) -> str:
+    """Слабый ETag по содержимому строки БД (бот тоже меняет строки — версия в памяти не годится)."""
+    digest = hashlib.blake2b(repr(tuple(row)).encode(), digest_size=8).hexdigest()
+    return f'W/"{_ETAG_SALT}-{digest}"'
 
 
 # ─── Auth ─────────────────────────────────────────────────────────────────────
@@ -358,7 +639,7 @@ async def root():
 async def login_page(request: Request, session: Optional[str] = Cookie(None)):
     if is_authenticated(session):
         return RedirectResponse(url="/alerts")
-    return templates.TemplateResponse("login.html", {"request": request})
+    return _render_static("login.html")
 
 
 @app.post("/login", response_class=HTMLResponse)
@@ -370,7 +651,7 @@ async def login(
     login_ok    = (not WEB_LOGIN) or username.strip() == WEB_LOGIN
     password_ok = password.strip() == WEB_PASSWORD
     if not login_ok or not password_ok:
-        return templates.TemplateResponse(
+        return _render(
             "login.html", {"request": request, "error": "Неверный логин или пароль"}
         )
     resp = RedirectResponse(url="/alerts", status_code=303)
@@ -420,17 +701,28 @@ async def logout():
 
 # ─── Portfolio ────────────────────────────────────────────────────────────────
 
-_MARKET_FILTERS = {
-    "all": lambda a: True,
-    "ru":  lambda a: a["exchange"] == "MOEX",
-    "us":  lambda a: a["exchange"] not in ("MOEX", "HKEX", "HKSE"),
-    "hk":  lambda a: a["exchange"] in ("HKEX", "HKSE"),
+# market → (биржи, входят ли они в рынок); "us" — всё, кроме MOEX и Гонконга.
+# Для "all" фильтра нет — _all_alerts отдаёт выборку как есть
+_MARKET_FILTERS: dict[str, tuple[frozenset[str], bool]] = {
+    "ru": (frozenset({"MOEX"}), True),
+    "us": (frozenset({"MOEX", "HKEX", "HKSE"}), False),
+    "hk": (frozenset({"HKEX", "HKSE"}), True),
 }
 
 
-def _apply_filter(alerts: list[dict], market: str) -> list[dict]:
-    fn = _MARKET_FILTERS.get(market, _MARKET_FILTERS["all"])
-    return [a for a in alerts if fn(a)]
+def _proximity_key(a: dict) -> float:
+    # Без цены — в конец списка; inf, а не 9999: dist_pct при копеечной
+    # текущей цене может оказаться больше любого «большого» числа
+    d = a["dist_pct"]
+    return d if d is not None else math.inf
+
+
+# sort → (ключ, reverse). created_at в схеме NOT NULL — хватает itemgetter
+_ALERT_SORTS = {
+    "proximity": (_proximity_key, False),
+    "newest":    (itemgetter("created_at"), True),
+    "oldest":    (itemgetter("created_at"), False),
+}
 
 
 @app.get("/alerts", response_class=HTMLResponse)
@@ -438,14 +730,10 @@ async def alerts_page(request: Request, session: Optional[str] = Cookie(None)):
     if not is_authenticated(session):
         return auth_redirect()
 
-    s        = await db.get_user_settings(PRIMARY_USER_ID)
-    disp_cur = s.get("display_currency", "original")
-    rates    = await get_rates() if disp_cur != "original" else {}
-    alerts   = await _all_alerts()
-    enriched = _enrich(alerts, disp_cur, rates)
-    grouped  = _group_alerts_for_display(enriched)
+    disp_cur, rates = await _display_ctx()
+    grouped = await _alerts_view("all", disp_cur, rates)
 
-    return templates.TemplateResponse("index.html", {
+    return _render("index.html", {
         "request":        request,
         "alerts":         grouped,
         "total":          len(grouped),
@@ -465,21 +753,15 @@ async def alerts_partial(
     if not is_authenticated(session):
         return HTMLResponse('<div id="alerts-wrap"></div>')
 
-    s        = await db.get_user_settings(PRIMARY_USER_ID)
-    disp_cur = s.get("display_currency", "original")
-    rates    = await get_rates() if disp_cur != "original" else {}
-    alerts   = await _all_alerts()
-    enriched = _apply_filter(_enrich(alerts, disp_cur, rates), market)
-    grouped  = _group_alerts_for_display(enriched)
+    disp_cur, rates = await _display_ctx()
+    grouped = await _alerts_view(market, disp_cur, rates)
 
-    if sort == "proximity":
-        grouped.sort(key=lambda a: a["dist_pct"] if a["dist_pct"] is not None else 9999)
-    elif sort == "newest":
-        grouped.sort(key=lambda a: a.get("created_at") or "", reverse=True)
-    elif sort == "oldest":
-        grouped.sort(key=lambda a: a.get("created_at") or "")
+    order = _ALERT_SORTS.get(sort)
+    if order is not None:
+        key, reverse = order
+        grouped.sort(key=key, reverse=reverse)
 
-    return templates.TemplateResponse("partials/alert_list.html", {
+    return _render("partials/alert_list.html", {
         "request": request,
         "alerts":  grouped,
         "market":  market,
@@ -492,8 +774,8 @@ async def alerts_partial(
 @app.get("/partials/add-form", response_class=HTMLResponse)
 async def add_form(request: Request, session: Optional[str] = Cookie(None)):
     if not is_authenticated(session):
-        return HTMLResponse("")
-    return templates.TemplateResponse("partials/add_form.html", {"request": request})
+        return _EMPTY
+    return _render_static("partials/add_form.html")
 
 
 @app.post("/partials/search", response_class=HTMLResponse)
@@ -503,12 +785,11 @@ async def search_ticker(
     session: Optional[str] = Cookie(None),
 ):
     if not is_authenticated(session):
-        return HTMLResponse("")
+        return _EMPTY
 
-    ticker  = ticker.upper().strip()
-    allowed = set("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.-")
-    if not ticker or len(ticker) > 20 or not set(ticker).issubset(allowed):
-        return templates.TemplateResponse(
+    ticker = ticker.upper().strip()
+    if not _TICKER_RE.match(ticker):
+        return _render(
             "partials/ticker_error.html",
             {"request": request, "error": "Неверный формат тикера"},
         )
@@ -516,7 +797,7 @@ async def search_ticker(
     stock = await _search_stock(ticker)
 
     if not stock:
-        return templates.TemplateResponse(
+        return _render(
             "partials/ticker_error.html",
             {"request": request, "error": f"Акция «{ticker}» не найдена. Проверьте тикер."},
         )
@@ -535,7 +816,7 @@ async def search_ticker(
         if converted != price:  # конвертация удалась
             alt_prices[target_cur] = f"{converted:.2f} {target_sym}"
 
-    return templates.TemplateResponse("partials/ticker_found.html", {
+    return _render("partials/ticker_found.html", {
         "request":    request,
         "stock":      stock,
         "sym":        sym,
@@ -558,55 +839,94 @@ async def add_alert(
     session: Optional[str] = Cookie(None),
 ):
     if not is_authenticated(session):
-        return HTMLResponse("", status_code=401)
+        return _EMPTY_401
 
     if not target_above and not target_below:
         return HTMLResponse(
             '<p style="color:var(--danger);padding:8px">Заполните хотя бы одно поле</p>'
         )
 
-    # Уведомления пойдут PRIMARY_USER_ID (первый из ALLOWED_USER_IDS в .env)
-    if target_above and target_above > 0:
-        await db.add_alert(
-            user_id=PRIMARY_USER_ID,
-            ticker=ticker,
-            exchange=exchange,
-            company_name=company_name,
-            target_price=target_above,
-            currency=currency,
-            direction="above",
-            current_price=current_price,
-        )
-
-    if target_below and target_below > 0:
-        await db.add_alert(
-            user_id=PRIMARY_USER_ID,
-            ticker=ticker,
-            exchange=exchange,
-            company_name=company_name,
-            target_price=target_below,
-            currency=currency,
-            direction="below",
-            current_price=current_price,
-        )
-
-    s        = await db.get_user_settings(PRIMARY_USER_ID)
-    disp_cur = s.get("display_currency", "original")
-    rates    = await get_rates() if disp_cur != "original" else {}
-    alerts   = await _all_alerts()
-    enriched = _enrich(alerts, disp_cur, rates)
-    grouped  = _group_alerts_for_display(enriched)
-
-    resp = templates.TemplateResponse(
-        "partials/alert_list.html",
-        {"request": request, "alerts": grouped, "market": "all", "sort": "default"},
-    )
+    # Уведомления пойдут PRIMARY_USER_ID (первый из ALLOWED_USER_IDS в .env).
+    # Оба направления — одной транзакцией (один commit вместо двух)
+    await db.add_alerts_many([
+        (PRIMARY_USER_ID, ticker, exchange, company_name,
+         target, currency, direction, current_price)
+        for target, direction in ((target_above, "above"), (target_below, "below"))
+        if target and target > 0
+    ])
+
+    _invalidate_view()
+
+    # Список не рендерим: обработчик alertAdded в base.html закрывает шит
+    # и сам перезапрашивает /partials/alerts — иначе список строился бы дважды
+    resp = HTMLResponse("")
+    resp.headers["HX-Reswap"]  = "none"
     resp.headers["HX-Trigger"] = "alertAdded"
     return resp
 
 
 # ─── Excel bulk import ───────────────────────────────────────────────────────
 
+# Одновременных поисков тикеров при импорте (лимиты MOEX/TD/Yahoo)
+_EXCEL_SEARCH_CONCURRENCY = 8
+
+ExcelEntry = tuple[str, Optional[float], Optional[float]]  # (тикер, выше, ниже)
+
+
+def _excel_float(raw) -> Optional[float]:
+    """Преобразует строку/число из ячейки в float или None."""
+    if raw is None:
+        return None
+    s = str(raw).replace(",", ".").strip()
+    if not s:
+        return None
+    try:
+        v = float(s)
+        return v if v > 0 else None
+    except ValueError:
+        return None
+
+
+def _read_excel_entries(content: bytes) -> Optional[list[ExcelEntry]]:
+    """
+    Разбирает .xlsx: колонки A — тикер, B — цель выше, C — цель ниже.
+    Возвращает строки с тикером и хотя бы одной ценой; None — лист пустой.
+    Синхронная — вызывается через asyncio.to_thread. Ошибки чтения пробрасывает.
+    """
+    import io
+    import openpyxl
+
+    # read_only — строки читаются потоком, без объектов ячеек на весь лист
+    wb = openpyxl.load_workbook(io.BytesIO(content), data_only=True, read_only=True)
+    try:
+        rows  = wb.active.iter_rows(max_col=3, values_only=True)  # нужны только A, B, C
+        first = next(rows, None)
+        if first is None:
+            return None
+
+        # Пропускаем первую строку если ни B, ни C не числа (это заголовок)
+        first_b = _excel_float(first[1] if len(first) > 1 else None)
+        first_c = _excel_float(first[2] if len(first) > 2 else None)
+        if first_b is not None or first_c is not None:
+            rows = itertools.chain((first,), rows)
+
+        entries: list[ExcelEntry] = []
+        for row in rows:
+            raw_ticker = str(row[0]).strip().upper() if row and row[0] else ""
+            if not raw_ticker:
+                continue
+
+            target_above = _excel_float(row[1] if len(row) > 1 else None)
+            target_below = _excel_float(row[2] if len(row) > 2 else None)
+
+            if target_above is None and target_below is None:
+                continue  # строка без цен — пропускаем
+            entries.append((raw_ticker, target_above, target_below))
+        return entries
+    finally:
+        wb.close()
+
+
 @app.post("/upload/excel", response_class=HTMLResponse)
 async def upload_excel(
     request: Request,
@@ -614,98 +934,76 @@ async def upload_excel(
     session: Optional[str] = Cookie(None),
 ):
     if not is_authenticated(session):
-        return HTMLResponse("", status_code=401)
-
-    import io
-    import openpyxl
+        return _EMPTY_401
 
     content = await file.read()
     try:
-        wb = openpyxl.load_workbook(io.BytesIO(content), data_only=True)
-        ws = wb.active
+        # openpyxl — синхронный и CPU-bound: разбираем файл в потоке,
+        # чтобы не держать event loop (опрос /partials/alerts и т.п.)
+        entries = await asyncio.to_thread(_read_excel_entries, content)
     except Exception:
-        return templates.TemplateResponse(
+        return _render(
             "partials/excel_result.html",
             {"request": request, "error": "Не удалось прочитать файл. Убедитесь, что это .xlsx"},
             status_code=400,
         )
-
-    rows = list(ws.iter_rows(values_only=True))
-    if not rows:
-        return templates.TemplateResponse(
+    if entries is None:
+        return _render(
             "partials/excel_result.html",
             {"request": request, "error": "Файл пустой"},
         )
 
-    def _to_float(raw) -> Optional[float]:
-        """Преобразует строку/число из ячейки в float или None."""
-        if raw is None:
-            return None
-        s = str(raw).replace(",", ".").strip()
-        if not s:
-            return None
-        try:
-            v = float(s)
-            return v if v > 0 else None
-        except ValueError:
-            return None
+    search_slots = asyncio.Semaphore(_EXCEL_SEARCH_CONCURRENCY)
 
-    # Пропускаем первую строку если ни B, ни C не числа (это заголовок)
-    start = 0
-    first_b = _to_float(rows[0][1] if len(rows[0]) > 1 else None)
-    first_c = _to_float(rows[0][2] if len(rows[0]) > 2 else None)
-    if first_b is None and first_c is None:
-        start = 1
+    async def _search_limited(ticker: str) -> Optional[dict]:
+        async with search_slots:
+            return await _search_stock(ticker)
 
     added, skipped = [], []
-    for row in rows[start:]:
-        raw_ticker = str(row[0]).strip().upper() if row[0] else ""
-        if not raw_ticker:
-            continue
-
-        target_above = _to_float(row[1] if len(row) > 1 else None)
-        target_below = _to_float(row[2] if len(row) > 2 else None)
+    bad     = [t for t, _, _ in entries if not _TICKER_RE.match(t)]
+    entries = [e for e in entries if _TICKER_RE.match(e[0])]
+    skipped.extend(f"{t} — неверный формат" for t in bad)
 
-        if target_above is None and target_below is None:
-            continue  # строка без цен — пропускаем
+    found = await asyncio.gather(
+        *(_search_limited(t) for t, _, _ in entries), return_exceptions=True
+    )
 
-        stock = await _search_stock(raw_ticker)
+    batch: list[tuple[str, str, list[tuple]]] = []  # (из файла, найденный, строки)
+    for (raw_ticker, target_above, target_below), stock in zip(entries, found):
+        if isinstance(stock, Exception):
+            logger.warning("excel import поиск %s: %s", raw_ticker, stock)
+            stock = None
         if not stock:
             skipped.append(f"{raw_ticker} — не найден")
             continue
 
-        try:
-            if target_above:
-                await db.add_alert(
-                    user_id=PRIMARY_USER_ID,
-                    ticker=stock["ticker"],
-                    exchange=stock["exchange"],
-                    company_name=stock["company_name"],
-                    target_price=target_above,
-                    currency=stock["currency"],
-                    direction="above",
-                    current_price=stock["price"],
-                )
-            if target_below:
-                await db.add_alert(
-                    user_id=PRIMARY_USER_ID,
-                    ticker=stock["ticker"],
-                    exchange=stock["exchange"],
-                    company_name=stock["company_name"],
-                    target_price=target_below,
-                    currency=stock["currency"],
-                    direction="below",
-                    current_price=stock["price"],
-                )
-            added.append(stock["ticker"])
-        except Exception as e:
-            skipped.append(f"{raw_ticker} — ошибка БД")
-            logger.error("excel import DB error %s: %s", raw_ticker, e)
-
-    # Обновляем список алертов и закрываем шит
-    alerts   = await _all_alerts()
-    enriched = _enrich(alerts)
-    resp = templates.TemplateResponse(
+        alert_rows = [
+            (PRIMARY_USER_ID, stock["ticker"], stock["exchange"], stock["company_name"],
+             target, stock["currency"], direction, stock["price"])
+            for target, direction in ((target_above, "above"), (target_below, "below"))
+            if target
+        ]
+        batch.append((raw_ticker, stock["ticker"], alert_rows))
+
+    # Одна транзакция на весь файл; если она упала — повторяем по строкам,
+    # чтобы в отчёт попали только действительно проблемные тикеры
+    try:
+        await db.add_alerts_many([r for _, _, alert_rows in batch for r in alert_rows])
+        added.extend(ticker for _, ticker, _ in batch)
+    except Exception as e:
+        logger.warning("excel import: пакетная вставка не удалась (%s), вставляем по строкам", e)
+        for raw_ticker, ticker, alert_rows in batch:
+            try:
+                await db.add_alerts_many(alert_rows)
+                added.append(ticker)
+            except Exception as e:
+                skipped.append(f"{raw_ticker} — ошибка БД")
+                logger.error("excel import DB error %s: %s", raw_ticker, e)
+
+    _invalidate_view()
+
+    # Список алертов обновит обработчик alertAdded на клиенте
+    resp = _render(
         "partials/excel_result.html",
         {"request": request, "added": added, "skipped": skipped},
     )
@@ -723,11 +1021,10 @@ async def delete_combined_alert(
 ):
     """Удаляет оба алерта (above + below) одной кнопкой из combined-карточки."""
     if not is_authenticated(session):
-        return HTMLResponse("", status_code=401)
-    async with __import__("aiosqlite").connect(db.db_path) as conn:
-        await conn.execute("DELETE FROM alerts WHERE id IN (?, ?)", (id_above, id_below))
-        await conn.commit()
-    return HTMLResponse("")
+        return _EMPTY_401
+    await db.delete_alerts((id_above, id_below))
+    _invalidate_view()
+    return _EMPTY
 
 
 @app.get("/partials/alerts/combined/{id_above}/{id_below}", response_class=HTMLResponse)
@@ -739,19 +1036,18 @@ async def combined_card_partial(
 ):
     """Возвращает combined-карточку в режиме просмотра (после отмены редактирования)."""
     if not is_authenticated(session):
-        return HTMLResponse("")
-    alert_above = await db.get_alert_by_id(id_above)
-    alert_below = await db.get_alert_by_id(id_below)
+        return _EMPTY
+    pair        = await db.get_alerts_by_ids((id_above, id_below))
+    alert_above = pair.get(id_above)
+    alert_below = pair.get(id_below)
     if not alert_above or not alert_below:
-        return HTMLResponse("")
-    s        = await db.get_user_settings(PRIMARY_USER_ID)
-    disp_cur = s.get("display_currency", "original")
-    rates    = await get_rates() if disp_cur != "original" else {}
+        return _EMPTY
+    disp_cur, rates = await _display_ctx()
     enriched = _enrich([alert_above, alert_below], disp_cur, rates)
     grouped  = _group_alerts_for_display(enriched)
     if not grouped or not grouped[0].get("is_combined"):
-        return HTMLResponse("")
-    return templates.TemplateResponse("partials/alert_card.html", {
+        return _EMPTY
+    return _render("partials/alert_card.html", {
         "request": request,
         "a":       grouped[0],
         "tv_url":  _tradingview_url(alert_above["ticker"], alert_above["exchange"]),
@@ -767,19 +1063,18 @@ async def combined_card_edit(
 ):
     """Возвращает combined-карточку в режиме редактирования."""
     if not is_authenticated(session):
-        return HTMLResponse("")
-    alert_above = await db.get_alert_by_id(id_above)
-    alert_below = await db.get_alert_by_id(id_below)
+        return _EMPTY
+    pair        = await db.get_alerts_by_ids((id_above, id_below))
+    alert_above = pair.get(id_above)
+    alert_below = pair.get(id_below)
     if not alert_above or not alert_below:
-        return HTMLResponse("")
-    s        = await db.get_user_settings(PRIMARY_USER_ID)
-    disp_cur = s.get("display_currency", "original")
-    rates    = await get_rates() if disp_cur != "original" else {}
+        return _EMPTY
+    disp_cur, rates = await _display_ctx()
     enriched = _enrich([alert_above, alert_below], disp_cur, rates)
     grouped  = _group_alerts_for_display(enriched)
     if not grouped or not grouped[0].get("is_combined"):
-        return HTMLResponse("")
-    return templates.TemplateResponse("partials/alert_card_edit_combined.html", {
+        return _EMPTY
+    return _render("partials/alert_card_edit_combined.html", {
         "request": request,
         "a":       grouped[0],
     })
@@ -796,24 +1091,25 @@ async def update_combined_targets(
 ):
     """Обновляет обе целевые цены combined-алерта."""
     if not is_authenticated(session):
-        return HTMLResponse("", status_code=401)
-    alert_above = await db.get_alert_by_id(id_above)
-    alert_below = await db.get_alert_by_id(id_below)
+        return _EMPTY_401
+    pair        = await db.get_alerts_by_ids((id_above, id_below))
+    alert_above = pair.get(id_above)
+    alert_below = pair.get(id_below)
     if not alert_above or not alert_below:
-        return HTMLResponse("", status_code=404)
-    current = alert_above.get("current_price") or alert_above["target_price"]
-    await db.update_alert_target(id_above, alert_above["user_id"], target_above, "above", current)
-    await db.update_alert_target(id_below, alert_below["user_id"], target_below, "below", current)
-    upd_above = await db.get_alert_by_id(id_above)
-    upd_below = await db.get_alert_by_id(id_below)
-    s        = await db.get_user_settings(PRIMARY_USER_ID)
-    disp_cur = s.get("display_currency", "original")
-    rates    = await get_rates() if disp_cur != "original" else {}
+        return _EMPTY_404
+    current = alert_above["current_price"] or alert_above["target_price"]
+    upd_above, upd_below = await db.update_combined_targets(
+        id_above, id_below, target_above, target_below, current
+    )
+    _invalidate_view()
+    if not upd_above or not upd_below:
+        return _EMPTY_404
+    disp_cur, rates = await _display_ctx()
     enriched = _enrich([upd_above, upd_below], disp_cur, rates)
     grouped  = _group_alerts_for_display(enriched)
     if not grouped or not grouped[0].get("is_combined"):
-        return HTMLResponse("")
-    return templates.TemplateResponse("partials/alert_card.html", {
+        return _EMPTY
+    return _render("partials/alert_card.html", {
         "request": request,
         "a":       grouped[0],
         "tv_url":  _tradingview_url(upd_above["ticker"], upd_above["exchange"]),
@@ -826,12 +1122,11 @@ async def delete_alert(
     session: Optional[str] = Cookie(None),
 ):
     if not is_authenticated(session):
-        return HTMLResponse("", status_code=401)
+        return _EMPTY_401
     # Не проверяем user_id — веб-приложение показывает все алерты
-    async with __import__("aiosqlite").connect(db.db_path) as conn:
-        await conn.execute("DELETE FROM alerts WHERE id = ?", (alert_id,))
-        await conn.commit()
-    return HTMLResponse("")
+    await db.delete_alerts((alert_id,))
+    _invalidate_view()
+    return _EMPTY
 
 
 @app.get("/partials/alerts/{alert_id}", response_class=HTMLResponse)
@@ -841,19 +1136,18 @@ async def alert_card_partial(
     session: Optional[str] = Cookie(None),
 ):
     if not is_authenticated(session):
-        return HTMLResponse("")
+        return _EMPTY
 
     alert = await db.get_alert_by_id(alert_id)
     if not alert:
-        return HTMLResponse("")
+        return _EMPTY
 
-    s        = await db.get_user_settings(PRIMARY_USER_ID)
-    disp_cur = s.get("display_currency", "original")
-    rates    = await get_rates() if disp_cur != "original" else {}
+    disp_cur, rates = await _display_ctx()
     enriched = _enrich_one(alert, disp_cur, rates)
-    return templates.TemplateResponse("partials/alert_card.html", {
+    enriched["is_combined"] = False
+    return _render("partials/alert_card.html", {
         "request": request,
-        "a":       {**enriched, "is_combined": False},
+        "a":       enriched,
         "tv_url":  _tradingview_url(alert["ticker"], alert["exchange"]),
     })
 
@@ -865,17 +1159,25 @@ async def alert_card_edit(
     session: Optional[str] = Cookie(None),
 ):
     if not is_authenticated(session):
-        return HTMLResponse("")
+        return _EMPTY
 
     alert = await db.get_alert_by_id(alert_id)
     if not alert:
-        return HTMLResponse("")
+        return _EMPTY
+
+    # Форма зависит только от строки алерта (валюта отображения не участвует)
+    etag = _row_etag(alert)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
 
     enriched = _enrich_one(alert)
-    return templates.TemplateResponse("partials/alert_card_edit.html", {
+    resp = _render("partials/alert_card_edit.html", {
         "request": request,
         "a":       enriched,
     })
+    resp.headers["ETag"]          = etag
+    resp.headers["Cache-Control"] = "no-cache"  # кешировать, но всегда сверять ETag
+    return resp
 
 
 @app.put("/alerts/{alert_id}/target", response_class=HTMLResponse)
@@ -887,29 +1189,31 @@ async def update_target(
     session: Optional[str] = Cookie(None),
 ):
     if not is_authenticated(session):
-        return HTMLResponse("", status_code=401)
+        return _EMPTY_401
 
     alert = await db.get_alert_by_id(alert_id)
     if not alert:
-        return HTMLResponse("", status_code=404)
+        return _EMPTY_404
 
-    current = alert.get("current_price") or alert["target_price"]
+    current = alert["current_price"] or alert["target_price"]
     if direction not in ("above", "below"):
         direction = "above" if target_price >= current else "below"
 
-    await db.update_alert_target(
-        alert_id, alert["user_id"], target_price, direction, current
+    # Запись и контекст отображения (настройки/курсы) друг от друга не зависят
+    updated, (disp_cur, rates) = await asyncio.gather(
+        db.update_alert_target(alert_id, alert["user_id"], target_price, direction, current),
+        _display_ctx(),
     )
+    _invalidate_view()
+    if not updated:
+        return _EMPTY_404
 
-    updated  = await db.get_alert_by_id(alert_id)
-    s        = await db.get_user_settings(PRIMARY_USER_ID)
-    disp_cur = s.get("display_currency", "original")
-    rates    = await get_rates() if disp_cur != "original" else {}
     enriched = _enrich_one(updated, disp_cur, rates)
+    enriched["is_combined"] = False
 
-    return templates.TemplateResponse("partials/alert_card.html", {
+    return _render("partials/alert_card.html", {
         "request": request,
-        "a":       {**enriched, "is_combined": False},
+        "a":       enriched,
         "tv_url":  _tradingview_url(updated["ticker"], updated["exchange"]),
     })
 
@@ -925,7 +1229,7 @@ async def settings_page(request: Request, session: Optional[str] = Cookie(None))
     s      = await db.get_user_settings(PRIMARY_USER_ID)
     td     = budget_status()
 
-    return templates.TemplateResponse("settings.html", {
+    return _render("settings.html", {
         "request":            request,
         "s":                  s,
         "ru_intervals":       RU_INTERVALS,
@@ -943,16 +1247,15 @@ async def set_ru_interval(
     session: Optional[str] = Cookie(None),
 ):
     if not is_authenticated(session):
-        return HTMLResponse("", status_code=401)
+        return _EMPTY_401
 
     if seconds not in RU_INTERVALS:
         raise HTTPException(400, "Недопустимый интервал")
 
-    await db.upsert_user_settings(PRIMARY_USER_ID, interval_ru=seconds)
-    s  = await db.get_user_settings(PRIMARY_USER_ID)
+    s = await db.upsert_user_settings(PRIMARY_USER_ID, interval_ru=seconds)
     td = budget_status()
 
-    return templates.TemplateResponse("partials/settings_intervals.html", {
+    return _render("partials/settings_intervals.html", {
         "request":            request,
         "s":                  s,
         "ru_intervals":       RU_INTERVALS,
@@ -969,16 +1272,15 @@ async def set_us_interval(
     session: Optional[str] = Cookie(None),
 ):
     if not is_authenticated(session):
-        return HTMLResponse("", status_code=401)
+        return _EMPTY_401
 
     if seconds not in US_INTERVALS:
         raise HTTPException(400, "Недопустимый интервал")
 
-    await db.upsert_user_settings(PRIMARY_USER_ID, interval_us=seconds)
-    s  = await db.get_user_settings(PRIMARY_USER_ID)
+    s = await db.upsert_user_settings(PRIMARY_USER_ID, interval_us=seconds)
     td = budget_status()
 
-    return templates.TemplateResponse("partials/settings_intervals.html", {
+    return _render("partials/settings_intervals.html", {
         "request":            request,
         "s":                  s,
         "ru_intervals":       RU_INTERVALS,
@@ -997,18 +1299,19 @@ async def switch_currency(
 ):
     """Быстрое переключение валюты прямо с главной страницы."""
     if not is_authenticated(session):
-        return HTMLResponse("", status_code=401)
+        return _EMPTY_401
 
     if code not in DISPLAY_CURRENCIES:
         raise HTTPException(400, "Недопустимая валюта")
 
-    await db.upsert_user_settings(PRIMARY_USER_ID, display_currency=code)
-    rates    = await get_rates() if code != "original" else {}
-    alerts   = await _all_alerts()
-    enriched = _apply_filter(_enrich(alerts, code, rates), market)
-    grouped  = _group_alerts_for_display(enriched)
+    # Запись настройки и курсы независимы; список строится уже по code
+    _, rates = await asyncio.gather(
+        db.upsert_user_settings(PRIMARY_USER_ID, display_currency=code),
+        get_rates() if code != "original" else _no_rates(),
+    )
+    grouped = await _alerts_view(market, code, rates)
 
-    resp = templates.TemplateResponse("partials/alert_list.html", {
+    resp = _render("partials/alert_list.html", {
         "request": request,
         "alerts":  grouped,
         "market":  market,
@@ -1025,16 +1328,15 @@ async def set_display_currency(
     session: Optional[str] = Cookie(None),
 ):
     if not is_authenticated(session):
-        return HTMLResponse("", status_code=401)
+        return _EMPTY_401
 
     if code not in DISPLAY_CURRENCIES:
         raise HTTPException(400, "Недопустимая валюта")
 
-    await db.upsert_user_settings(PRIMARY_USER_ID, display_currency=code)
-    s  = await db.get_user_settings(PRIMARY_USER_ID)
+    s = await db.upsert_user_settings(PRIMARY_USER_ID, display_currency=code)
     td = budget_status()
 
-    return templates.TemplateResponse("partials/settings_intervals.html", {
+    return _render("partials/settings_intervals.html", {
         "request":            request,
         "s":                  s,
         "ru_intervals":       RU_INTERVALS,